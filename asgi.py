@@ -0,0 +1,133 @@
+import asyncio
+import io
+import logging
+import sys
+import uvicorn
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Routes whose handlers mine, verify signatures or validate chains. They get
+# their own small pool so they can never occupy every thread the cheap
+# queries need.
+HEAVY_ROUTES = {
+    '/mine', '/sync', '/add_block', '/wallet/create', '/transaction/create', '/transaction/add',
+    '/transaction/sign', '/transaction/verify', '/transaction/submit_offchain', '/transactions/batch'
+}
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class AsgiApp:
+    """ASGI application serving the Flask routes from routes.setup_routes.
+
+    The event loop only parses requests and writes responses; each Flask handler
+    runs on an executor. Routes in HEAVY_ROUTES use `heavy_workers` threads and
+    everything else uses `workers`, so a slow /mine or /sync does not hold up
+    /balance or /chain. Streaming responses (e.g. /chain) are pulled from the
+    handler's iterator on the executor and sent in chunks of STREAM_CHUNK_BYTES.
+    Mining and signature checks still use the miner's and verifier's process
+    pools underneath.
+    """
+
+    def __init__(self, wsgi_app, workers=16, heavy_workers=2):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.heavy_executor = ThreadPoolExecutor(max_workers=heavy_workers, thread_name_prefix="api-heavy")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        executor = self.heavy_executor if scope['path'] in HEAVY_ROUTES else self.executor
+        loop = asyncio.get_running_loop()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+            return lambda data: None
+
+        def first_chunk():
+            iterable = self.wsgi_app(self._environ(scope, bytes(body)), start_response)
+            iterator = iter(iterable)
+            return iterable, iterator, self._read_chunk(iterator)
+
+        iterable, iterator, (chunk, more) = await loop.run_in_executor(executor, first_chunk)
+        try:
+            await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+            while more:
+                chunk, more = await loop.run_in_executor(executor, self._read_chunk, iterator)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+        finally:
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(executor, iterable.close)
+
+    @staticmethod
+    def _read_chunk(iterator):
+        """Up to STREAM_CHUNK_BYTES of the response; returns (data, more_to_come)."""
+        chunk = bytearray()
+        for data in iterator:
+            chunk += data
+            if len(chunk) >= STREAM_CHUNK_BYTES:
+                return bytes(chunk), True
+        return bytes(chunk), False
+
+    @staticmethod
+    def _environ(scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'CONTENT_LENGTH': str(len(body))
+        }
+        # The body has already been read (and de-chunked) into wsgi.input, so the
+        # client's Content-Length and Transfer-Encoding no longer apply.
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name not in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                key = f'HTTP_{name}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                self.heavy_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def run_asgi(app, host='0.0.0.0', port=5000):
+    """Serve the app with uvicorn until the process exits."""
+    uvicorn.run(app, host=host, port=port, log_level="warning")
@@ -0,0 +1,275 @@
+"""Timings of the core engine: mining, Merkle trees, signatures, chain validation and persistence.
+
+Run from the repository root:  python -m benchmarks.engine --json results/engine.json
+
+Each case reports the mean, min and max seconds per call over `repeat` runs.
+The chain cases use a chain of one-transaction blocks (difficulty 1, a newly
+signed transfer from the genesis wallet in every block, since validation
+rejects replays) and the in-process MemoryStorage, so they measure the engine
+rather than a database. The full set, up to 100,000 blocks, takes several
+minutes, mostly signing and verifying; --quick runs small sizes only. The JSON output carries the commit
+and environment so runs can be compared over time.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from blockchain.block import Block
+from blockchain.blockchain import Blockchain
+from blockchain.merkle_tree import MerkleTree
+from cryptolib.crypto import Crypto
+from database.memory_storage import MemoryStorage
+
+GENESIS_PRIVATE_KEY = "66DfCadKUjJBkBbOlURslW1V020v6MzLq7ExQb15j_A"
+GENESIS_PUBLIC_KEY = "AtV2Ohy1KCwD_RAJ4D6yB60I-CxBbtpubhGmr55LTtMQ"
+
+DIFFICULTIES = (1, 2, 3, 4)
+MERKLE_SIZES = (10, 100, 1000, 10000)
+CHAIN_SIZES = (1000, 10000, 100000)
+QUICK_MERKLE_SIZES = (10, 100, 1000)
+QUICK_CHAIN_SIZES = (100, 1000)
+
+
+def _time(function, repeat=5, number=1, setup=None):
+    """Seconds per call of function(), over `repeat` runs of `number` calls each."""
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        runs.append((time.perf_counter() - started) / number)
+    return {"seconds": sum(runs) / len(runs), "min_seconds": min(runs), "max_seconds": max(runs),
+            "repeat": repeat, "number": number}
+
+
+def _result(name, params, timing):
+    return {"name": name, "params": params, **timing}
+
+
+def _transactions(count):
+    private_key, sender = Crypto.generate_keypair()
+    recipient = Crypto.generate_keypair()[1]
+    signature = Crypto.sign_transaction(private_key, f"{sender}{recipient}1")
+    return [{"sender": sender, "recipient": recipient, "amount": 1, "signature": signature,
+             "transaction_id": str(uuid.uuid4()), "timestamp": 1700000000.0 + i} for i in range(count)]
+
+
+def _blockchain(storage):
+    return Blockchain(storage, GENESIS_PRIVATE_KEY, GENESIS_PUBLIC_KEY, difficulty=1)
+
+
+def build_chain(block_count):
+    """Genesis plus block_count - 1 mined blocks, each moving 1 coin from the genesis wallet."""
+    genesis = _blockchain(MemoryStorage()).chain[0]
+    recipient = Crypto.generate_keypair()[1]
+    message = f"{GENESIS_PUBLIC_KEY}{recipient}1"
+    chain = [genesis]
+    for index in range(1, block_count):
+        timestamp = genesis.timestamp + index
+        transaction = {"sender": GENESIS_PUBLIC_KEY, "recipient": recipient, "amount": 1,
+                       "signature": Crypto.sign_transaction(GENESIS_PRIVATE_KEY, message),
+                       "transaction_id": f"bench-{index}", "timestamp": timestamp}
+        block = Block(index, [transaction], chain[-1].hash, timestamp=timestamp)
+        block.mine(difficulty=1)
+        chain.append(block)
+    return chain, recipient
+
+
+def _stored_node(chain, recipient, persistence_mode="append"):
+    """A node that loads `chain` from a MemoryStorage checkpoint, as it would on restart."""
+    storage = MemoryStorage()
+    storage.save_blocks(chain)
+    storage.save_tip({"index": chain[-1].index, "hash": chain[-1].hash})
+    transferred = len(chain) - 1
+    storage.save_checkpoint({
+        "height": chain[-1].index,
+        "delta_seq": 0,
+        "mempool": [],
+        "wallets": {GENESIS_PUBLIC_KEY: 1000000 - transferred, recipient: transferred},
+        "genesis_public_key": GENESIS_PUBLIC_KEY
+    })
+    blockchain = _blockchain(storage)
+    blockchain.persistence_mode = persistence_mode
+    blockchain.auto_mine_threshold = 10 ** 9
+    return blockchain
+
+
+def bench_block_mine(difficulties=DIFFICULTIES, repeat=5):
+    transactions = _transactions(10)
+    results = []
+    for difficulty in difficulties:
+        blocks = iter([Block(1, transactions, "0" * 64, timestamp=1700000000.0 + i) for i in range(repeat)])
+        hashes = []
+
+        def mine():
+            block = next(blocks)
+            block.mine(difficulty=difficulty)
+            hashes.append(block.nonce + 1)
+
+        result = _time(mine, repeat)
+        result["hashes_per_second"] = sum(hashes) / (result["seconds"] * repeat) if result["seconds"] else 0.0
+        results.append(_result("block_mine", {"difficulty": difficulty}, result))
+    return results
+
+
+def bench_merkle_tree(sizes=MERKLE_SIZES, repeat=5):
+    results = []
+    for size in sizes:
+        transactions = _transactions(size)
+        result = _time(lambda: MerkleTree(transactions).root, repeat)
+        results.append(_result("merkle_tree", {"transactions": size}, result))
+    return results
+
+
+def bench_signatures(repeat=5, number=20):
+    private_key, public_key = Crypto.generate_keypair()
+    message = f"{public_key}{Crypto.generate_keypair()[1]}1"
+    signature = Crypto.sign_transaction(private_key, message)
+    return [
+        _result("sign_transaction", {}, _time(lambda: Crypto.sign_transaction(private_key, message), repeat, number)),
+        _result("verify_signature", {}, _time(lambda: Crypto.verify_signature(public_key, message, signature),
+                                              repeat, number))
+    ]
+
+
+def bench_add_transaction(chain, recipient, count=1000, repeat=3):
+    """add_transaction into the mempool of a node holding `chain`, including its delta writes."""
+    blockchain = _stored_node(chain, recipient)
+    message = f"{GENESIS_PUBLIC_KEY}{recipient}1"
+    # Each transaction needs its own signature: the mempool treats a repeated one as a duplicate.
+    batches = iter([[{"sender": GENESIS_PUBLIC_KEY, "recipient": recipient, "amount": 1,
+                      "signature": Crypto.sign_transaction(GENESIS_PRIVATE_KEY, message),
+                      "transaction_id": str(uuid.uuid4())} for _ in range(count)] for _ in range(repeat)])
+
+    def add_all():
+        for transaction in next(batches):
+            blockchain.add_transaction(transaction)
+
+    result = _time(add_all, repeat, setup=lambda: blockchain.writer.submit(blockchain.mempool.clear))
+    result.update(seconds=result["seconds"] / count, min_seconds=result["min_seconds"] / count,
+                  max_seconds=result["max_seconds"] / count, number=count)
+    return [_result("add_transaction", {"blocks": len(chain)}, result)]
+
+
+def bench_is_valid_chain(chain, repeat=1):
+    """Full validation of every block after genesis by a node that holds only genesis."""
+    blockchain = _blockchain(MemoryStorage())
+    valid = []
+    result = _time(lambda: valid.append(blockchain.is_valid_chain(chain)), repeat)
+    if not all(valid):
+        raise AssertionError("benchmark chain failed validation")
+    return [_result("is_valid_chain", {"blocks": len(chain)}, result)]
+
+
+def bench_recalculate_wallets(blockchain, repeat=3):
+    """Cold recomputation of every balance from genesis (fork_index 1 drops all ledger snapshots)."""
+    result = _time(lambda: blockchain.recalculate_wallets(1), repeat)
+    return [_result("recalculate_wallets", {"blocks": len(blockchain.chain)}, result)]
+
+
+def bench_state(blockchain, repeat=3):
+    """save_state/load_state of the legacy single document and of an append-mode checkpoint.
+
+    In append mode the blocks are already stored, so a save writes only the
+    checkpoint and a load reads every block back and rebuilds the indexes.
+    """
+    results = []
+    for mode in ("state", "append"):
+        blockchain.persistence_mode = mode
+        saved = _time(blockchain.save_state, repeat)
+        saved["bytes"] = len(blockchain.storage.documents["blockchain_state" if mode == "state" else "checkpoint"])
+        loaded = _time(blockchain.load_state, repeat)
+        params = {"blocks": len(blockchain.chain), "persistence_mode": mode}
+        results.append(_result("save_state", params, saved))
+        results.append(_result("load_state", params, loaded))
+    blockchain.persistence_mode = "append"
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=10,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(quick=False, only=None, chain_sizes=None):
+    """Run every case (or those whose name contains one of `only`); returns the JSON-ready report."""
+    chain_sizes = chain_sizes or (QUICK_CHAIN_SIZES if quick else CHAIN_SIZES)
+    repeat = 3 if quick else 5
+    cases = [
+        ("block_mine", lambda: bench_block_mine(DIFFICULTIES[:3] if quick else DIFFICULTIES, repeat)),
+        ("merkle_tree", lambda: bench_merkle_tree(QUICK_MERKLE_SIZES if quick else MERKLE_SIZES, repeat)),
+        ("signatures", lambda: bench_signatures(repeat, 5 if quick else 20)),
+    ]
+    full_chain = []
+
+    def chain_of(size):
+        if not full_chain:
+            full_chain.extend(build_chain(max(chain_sizes)))
+        chain, recipient = full_chain
+        return chain[:size], recipient
+
+    for size in chain_sizes:
+        cases += [
+            ("add_transaction", lambda size=size: bench_add_transaction(*chain_of(size), count=200 if quick else 1000)),
+            ("is_valid_chain", lambda size=size: bench_is_valid_chain(chain_of(size)[0])),
+            ("recalculate_wallets", lambda size=size: bench_recalculate_wallets(_stored_node(*chain_of(size)))),
+            ("save_state", lambda size=size: bench_state(_stored_node(*chain_of(size)))),
+        ]
+
+    started = time.time()
+    results = []
+    for name, case in cases:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results.extend(case())
+    return {
+        "suite": "engine",
+        "started_at": started,
+        "duration_seconds": time.time() - started,
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": quick,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--json', metavar='PATH', help="write the report as JSON to PATH ('-' for stdout)")
+    parser.add_argument('--quick', action='store_true', help="small sizes and fewer repeats")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help="run only cases whose name contains NAME (repeatable); save_state includes load_state")
+    parser.add_argument('--chain-sizes', metavar='N,N,...', help="chain lengths for the chain cases")
+    args = parser.parse_args()
+    chain_sizes = tuple(int(size) for size in args.chain_sizes.split(',')) if args.chain_sizes else None
+    report = run(args.quick, args.only, chain_sizes)
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == '-':
+            print(text)
+            return
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, 'w') as f:
+            f.write(text + "\n")
+    print(f"{'case':22}{'params':34}{'mean ms':>12}{'min ms':>12}")
+    for result in report["results"]:
+        params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+        print(f"{result['name']:22}{params:34}{result['seconds'] * 1000:12.3f}{result['min_seconds'] * 1000:12.3f}")
+    print(f"total {report['duration_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
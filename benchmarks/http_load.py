@@ -0,0 +1,161 @@
+"""Requests/sec and latency of the node API under the old WSGI server and the ASGI server.
+
+Run from the repository root:  python -m benchmarks.http_load --clients 8 --seconds 10
+
+Each server runs a fresh node (SQLite storage in a temporary directory) in its
+own process. `clients` threads loop over cheap queries while one more client
+keeps submitting a transaction and calling /mine, which is what stalls the
+single-threaded development server.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from cryptolib.crypto import Crypto
+
+READ_PATHS = ['/chain/tip', '/balance/{address}', '/pending_transactions', '/wallets', '/headers?from=0&to=20']
+
+
+def _serve(server, port, difficulty, directory):
+    from werkzeug.serving import make_server
+    from blockchain.blockchain import Blockchain
+    from database.sqlite_handler import SQLiteHandler
+    from asgi import run_asgi
+    from run import create_app, create_asgi_app
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        blockchain = Blockchain(SQLiteHandler(os.path.join(directory, f"{server}.sqlite3")),
+                                *_genesis_keys(), difficulty=difficulty)
+    blockchain.auto_mine_threshold = 10 ** 9
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if server == "wsgi":
+            make_server('127.0.0.1', port, create_app(blockchain, port)).serve_forever()
+        else:
+            run_asgi(create_asgi_app(blockchain, port), '127.0.0.1', port)
+
+
+def _genesis_keys():
+    return "66DfCadKUjJBkBbOlURslW1V020v6MzLq7ExQb15j_A", "AtV2Ohy1KCwD_RAJ4D6yB60I-CxBbtpubhGmr55LTtMQ"
+
+
+def _request(connection, method, path, body=None):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    try:
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except (http.client.HTTPException, OSError):
+        connection.close()
+        return None
+
+
+def _wait_until_up(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        if _request(connection, 'GET', '/chain/tip') == 200:
+            connection.close()
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def _reader(port, address, stop, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    paths = [path.format(address=address) for path in READ_PATHS]
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        status = _request(connection, 'GET', paths[i % len(paths)])
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(status)
+        i += 1
+
+
+def _miner(port, stop, mined):
+    private_key, public_key = _genesis_keys()
+    _, recipient = Crypto.generate_keypair()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    while not stop.is_set():
+        _request(connection, 'POST', '/transaction/create',
+                 {"sender": public_key, "recipient": recipient, "amount": 1, "private_key": private_key})
+        if _request(connection, 'GET', '/mine') == 200:
+            mined.append(1)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def measure(server, port, clients, seconds, difficulty, directory):
+    process = multiprocessing.Process(target=_serve, args=(server, port, difficulty, directory), daemon=True)
+    process.start()
+    try:
+        _wait_until_up(port)
+        stop = threading.Event()
+        latencies, errors, mined = [], [], []
+        threads = [threading.Thread(target=_reader, args=(port, _genesis_keys()[1], stop, latencies, errors))
+                   for _ in range(clients)]
+        threads.append(threading.Thread(target=_miner, args=(port, stop, mined)))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.join()
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_seconds": _percentile(latencies, 0.50),
+        "p99_seconds": _percentile(latencies, 0.99),
+        "max_seconds": max(latencies) if latencies else float('nan'),
+        "errors": len(errors),
+        "blocks_mined": len(mined)
+    }
+
+
+def run(clients=8, seconds=10, difficulty=4, port=5900):
+    results = {"clients": clients, "seconds": seconds, "difficulty": difficulty}
+    with tempfile.TemporaryDirectory() as directory:
+        results["wsgi"] = measure("wsgi", port, clients, seconds, difficulty, directory)
+        results["asgi"] = measure("asgi", port + 1, clients, seconds, difficulty, directory)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--difficulty', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5900)
+    args = parser.parse_args()
+    result = run(args.clients, args.seconds, args.difficulty, args.port)
+    print(f"{result['clients']} query clients + 1 mining client for {result['seconds']}s, difficulty {result['difficulty']}")
+    print(f"  {'':6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}{'mined':>7}")
+    for server in ("wsgi", "asgi"):
+        row = result[server]
+        print(f"  {server:6}{row['requests_per_second']:10.1f}{row['p50_seconds'] * 1000:10.1f}"
+              f"{row['p99_seconds'] * 1000:10.1f}{row['max_seconds'] * 1000:10.1f}{row['errors']:8}{row['blocks_mined']:7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Size and encode/decode speed of the binary block encoding against dict/JSON.
+
+Run from the repository root:  python -m benchmarks.serialization --blocks 50 --transactions 100
+"""
+import argparse
+import json
+import time
+import uuid
+from blockchain.block import Block
+from blockchain.serialization import decode_blocks, encode_blocks
+from cryptolib.crypto import Crypto
+
+
+def make_blocks(block_count, transactions_per_block):
+    keys = [Crypto.generate_keypair() for _ in range(8)]
+    blocks = []
+    previous_hash = "0" * 64
+    for index in range(block_count):
+        transactions = []
+        for i in range(transactions_per_block):
+            private_key, sender = keys[i % len(keys)]
+            recipient = keys[(i + 1) % len(keys)][1]
+            amount = 1 + i
+            transactions.append({
+                "sender": sender,
+                "recipient": recipient,
+                "amount": amount,
+                "signature": Crypto.sign_transaction(private_key, f"{sender}{recipient}{amount}"),
+                "transaction_id": str(uuid.uuid4()),
+                "timestamp": time.time()
+            })
+        block = Block(index, transactions, previous_hash)
+        block.mine(difficulty=1)
+        blocks.append(block)
+        previous_hash = block.hash
+    return blocks
+
+
+def _timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def run(block_count=20, transactions_per_block=100, repeat=5):
+    blocks = make_blocks(block_count, transactions_per_block)
+
+    json_encode, json_payload = _timed(lambda: json.dumps([block.to_dict() for block in blocks]).encode('utf-8'), repeat)
+    json_decode, _ = _timed(lambda: [Block.from_dict(data) for data in json.loads(json_payload)], repeat)
+    binary_encode, binary_payload = _timed(lambda: encode_blocks(blocks), repeat)
+    binary_decode, decoded = _timed(lambda: [Block.from_dict(data) for data in decode_blocks(binary_payload)], repeat)
+
+    if [block.hash for block in decoded] != [block.hash for block in blocks]:
+        raise AssertionError("binary round trip changed the blocks")
+    return {
+        "blocks": block_count,
+        "transactions_per_block": transactions_per_block,
+        "json_bytes": len(json_payload),
+        "binary_bytes": len(binary_payload),
+        "size_ratio": len(binary_payload) / len(json_payload),
+        "json_encode_seconds": json_encode,
+        "json_decode_seconds": json_decode,
+        "binary_encode_seconds": binary_encode,
+        "binary_decode_seconds": binary_decode
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=20)
+    parser.add_argument('--transactions', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    result = run(args.blocks, args.transactions, args.repeat)
+    print(f"{result['blocks']} blocks x {result['transactions_per_block']} transactions")
+    print(f"  JSON:   {result['json_bytes']:>10,} bytes  encode {result['json_encode_seconds'] * 1000:8.2f} ms"
+          f"  decode {result['json_decode_seconds'] * 1000:8.2f} ms")
+    print(f"  binary: {result['binary_bytes']:>10,} bytes  encode {result['binary_encode_seconds'] * 1000:8.2f} ms"
+          f"  decode {result['binary_decode_seconds'] * 1000:8.2f} ms")
+    print(f"  binary size is {result['size_ratio']:.0%} of JSON")
+
+
+if __name__ == "__main__":
+    main()
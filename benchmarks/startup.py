@@ -0,0 +1,81 @@
+"""Node startup time with and without a snapshot file.
+
+Run from the repository root:  python -m benchmarks.startup --blocks 2000 --transactions 20
+
+Blocks are stored in a temporary SQLite database. "full" loads and indexes
+every block before the node is ready; "snapshot" is ready once the recent
+blocks are loaded, and the rest of the history arrives in the background.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from benchmarks.serialization import make_blocks
+from blockchain.blockchain import Blockchain
+from database.sqlite_handler import SQLiteHandler
+
+
+def _open(path, snapshot_path=None, recent_blocks=100):
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        blockchain = Blockchain(SQLiteHandler(path), difficulty=1, snapshot_path=snapshot_path,
+                                recent_blocks=recent_blocks)
+        ready = time.perf_counter() - started
+        blockchain.wait_for_history()
+        history = time.perf_counter() - started
+    blockchain.storage.close()
+    return blockchain, ready, history
+
+
+def run(block_count=1000, transactions_per_block=20, recent_blocks=100):
+    blocks = make_blocks(block_count, transactions_per_block)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "node.sqlite3")
+        snapshot_path = os.path.join(directory, "node.snapshot.json")
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage = SQLiteHandler(path)
+            storage.save_blocks(blocks)
+            storage.save_tip({"index": blocks[-1].index, "hash": blocks[-1].hash})
+            storage.save_checkpoint({"height": blocks[-1].index, "delta_seq": 0, "mempool": [], "wallets": {}})
+            storage.close()
+
+        full, full_ready, _ = _open(path)
+        # Opening with a snapshot path and checkpointing once writes the snapshot file.
+        with contextlib.redirect_stdout(io.StringIO()):
+            full.storage = SQLiteHandler(path)
+            full.snapshot_path = snapshot_path
+            full.save_checkpoint()
+            full.wait_for_snapshot()
+            full.storage.close()
+        snapshot, snapshot_ready, snapshot_history = _open(path, snapshot_path, recent_blocks)
+
+        if [block.hash for block in snapshot.chain] != [block.hash for block in full.chain]:
+            raise AssertionError("snapshot startup produced a different chain")
+        return {
+            "blocks": block_count,
+            "transactions_per_block": transactions_per_block,
+            "snapshot_bytes": os.path.getsize(snapshot_path),
+            "full_ready_seconds": full_ready,
+            "snapshot_ready_seconds": snapshot_ready,
+            "snapshot_history_seconds": snapshot_history
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=1000)
+    parser.add_argument('--transactions', type=int, default=20)
+    parser.add_argument('--recent', type=int, default=100)
+    args = parser.parse_args()
+    result = run(args.blocks, args.transactions, args.recent)
+    print(f"{result['blocks']} blocks x {result['transactions_per_block']} transactions"
+          f" (snapshot {result['snapshot_bytes']:,} bytes)")
+    print(f"  full load:  ready in {result['full_ready_seconds'] * 1000:8.1f} ms")
+    print(f"  snapshot:   ready in {result['snapshot_ready_seconds'] * 1000:8.1f} ms,"
+          f" full history after {result['snapshot_history_seconds'] * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
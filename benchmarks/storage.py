@@ -0,0 +1,101 @@
+"""Write and read speed of the CouchDB and SQLite storage backends side by side.
+
+Run from the repository root:  python -m benchmarks.storage --blocks 200 --transactions 20
+
+CouchDB is measured against the in-process FakeCouchDB server unless
+--couchdb-url points at a real one; either way every call is a real HTTP
+round trip, which is the cost the embedded backend removes.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import uuid
+from benchmarks.serialization import make_blocks
+from database.couchdb_handler import CouchDBHandler
+from database.fake_couchdb import FakeCouchDB
+from database.sqlite_handler import SQLiteHandler
+
+
+def _timed(function):
+    # The handlers log every write; keep that out of the timings and the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = function()
+        return time.perf_counter() - started, result
+
+
+def _append(storage, blocks):
+    """The per-block write pattern of append persistence: block, delta, tip."""
+    for seq, block in enumerate(blocks):
+        storage.save_block(block, overwrite=True)
+        storage.append_delta(seq, {"op": "block", "index": block.index})
+        storage.save_tip({"index": block.index, "hash": block.hash})
+
+
+def _checkpoints(storage, count):
+    for height in range(count):
+        storage.save_checkpoint({"height": height, "wallets": {}, "mempool": []})
+
+
+def measure(storage, blocks):
+    results = {}
+    results["append_seconds"], _ = _timed(lambda: _append(storage, blocks))
+    results["bulk_save_seconds"], _ = _timed(lambda: storage.save_blocks(blocks))
+    results["load_seconds"], loaded = _timed(lambda: storage.load_blocks(0, len(blocks) - 1))
+    results["load_deltas_seconds"], _ = _timed(lambda: storage.load_deltas(0))
+    results["checkpoint_seconds"], _ = _timed(lambda: _checkpoints(storage, 50))
+    if [block.hash for block in loaded] != [block.hash for block in blocks]:
+        raise AssertionError(f"{type(storage).__name__} returned different blocks")
+    return results
+
+
+def run(block_count=100, transactions_per_block=20, couchdb_url=None):
+    blocks = make_blocks(block_count, transactions_per_block)
+    results = {"blocks": block_count, "transactions_per_block": transactions_per_block}
+
+    server = None
+    if couchdb_url is None:
+        server = FakeCouchDB().start()
+        couchdb_url = server.url
+    with contextlib.redirect_stdout(io.StringIO()):
+        couchdb = CouchDBHandler(f"benchmark_{uuid.uuid4().hex[:8]}", url=couchdb_url)
+    try:
+        results["couchdb"] = measure(couchdb, blocks)
+    finally:
+        couchdb.close()
+        if server is not None:
+            server.stop()
+
+    with tempfile.TemporaryDirectory() as directory:
+        with contextlib.redirect_stdout(io.StringIO()):
+            sqlite = SQLiteHandler(os.path.join(directory, "benchmark.sqlite3"))
+        try:
+            results["sqlite"] = measure(sqlite, blocks)
+        finally:
+            sqlite.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=100)
+    parser.add_argument('--transactions', type=int, default=20)
+    parser.add_argument('--couchdb-url', default=None, help="real CouchDB to measure instead of FakeCouchDB")
+    args = parser.parse_args()
+    result = run(args.blocks, args.transactions, args.couchdb_url)
+    print(f"{result['blocks']} blocks x {result['transactions_per_block']} transactions")
+    print(f"  {'':20}{'couchdb':>12}{'sqlite':>12}")
+    for key, label in [("append_seconds", "append (per block)"),
+                       ("bulk_save_seconds", "bulk save"),
+                       ("load_seconds", "load blocks"),
+                       ("load_deltas_seconds", "load deltas"),
+                       ("checkpoint_seconds", "50 checkpoints")]:
+        couchdb, sqlite = result["couchdb"][key], result["sqlite"][key]
+        print(f"  {label:20}{couchdb * 1000:10.1f}ms{sqlite * 1000:10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
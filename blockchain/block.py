@@ -1,40 +1,91 @@
+import logging
 import time
 from cryptolib.crypto import Crypto
 from blockchain.merkle_tree import MerkleTree
+from blockchain.miner import find_nonce
+from blockchain.serialization import decode_block, encode_block
+
+logger = logging.getLogger(__name__)
 
 
 class Block:
-    def __init__(self, index, transactions, previous_hash, timestamp=None, nonce=0, merkle_root=None):
+    __slots__ = ('index', 'transactions', 'timestamp', 'previous_hash', 'merkle_root',
+                 '_nonce', '_hash', '_hash_verified', '_merkle_tree')
+
+    def __init__(self, index, transactions, previous_hash, timestamp=None, nonce=0, merkle_root=None, block_hash=None):
         self.index = index
         self.transactions = self._prepare_transactions(transactions)
         self.timestamp = timestamp or time.time()
         self.previous_hash = previous_hash
-        self.nonce = nonce
+        self._nonce = nonce
+        self._merkle_tree = None
         self.merkle_root = merkle_root or self.calculate_merkle_root()
+        # A hash supplied from storage or a peer is only trusted once it has been recomputed.
+        self._hash = block_hash
+        self._hash_verified = False
+
+    @property
+    def nonce(self):
+        return self._nonce
+
+    @nonce.setter
+    def nonce(self, value):
+        self._nonce = value
+        self._hash = None
+        self._hash_verified = False
+
+    @property
+    def hash(self):
+        """Memoized block hash; a deserialized hash is verified on first access."""
+        if not self._hash_verified:
+            computed = self.compute_hash()
+            if self._hash is not None and self._hash != computed:
+                logger.warning("Stored hash of block %s does not match its contents.", self.index)
+            self._hash = computed
+            self._hash_verified = True
+        return self._hash
 
     def _prepare_transactions(self, transactions):
         if isinstance(transactions, list):
             return [tx if isinstance(tx, dict) else tx.to_dict() for tx in transactions]
         return []
 
+    @property
+    def merkle_tree(self):
+        """The block's MerkleTree, built on first use and kept for serving proofs."""
+        if self._merkle_tree is None:
+            self._merkle_tree = MerkleTree(self.transactions)
+        return self._merkle_tree
+
     def calculate_merkle_root(self):
-        merkle_tree = MerkleTree(self.transactions)
-        return merkle_tree.root
+        return self.merkle_tree.root
 
-    def compute_hash(self):
-        data = (
+    def header_prefix(self):
+        """Every hashed header field except the nonce, which is appended last."""
+        return (
             str(self.index)
             + str(self.merkle_root)
             + str(self.timestamp)
             + str(self.previous_hash)
-            + str(self.nonce)
         )
-        return Crypto.hash(data)
 
-    def mine(self, difficulty=4):
-        target = '0' * difficulty
-        while not self.compute_hash().startswith(target):
-            self.nonce += 1
+    def compute_hash(self):
+        return Crypto.hash(self.header_prefix() + str(self.nonce))
+
+    def mine(self, difficulty=4, miner=None):
+        """Find a nonce meeting the difficulty; returns False if a miner cancelled the search."""
+        if miner is not None:
+            nonce = miner.mine(self.header_prefix(), difficulty, start_nonce=self.nonce)
+            digest = None
+        else:
+            nonce, digest, _ = find_nonce(self.header_prefix(), difficulty, start_nonce=self.nonce)
+        if nonce is None:
+            return False
+        self.nonce = nonce
+        if digest is not None:
+            self._hash = digest
+            self._hash_verified = True
+        return True
 
     def to_dict(self):
         return {
@@ -43,9 +94,42 @@ class Block:
             "timestamp": self.timestamp,
             "previous_hash": self.previous_hash,
             "nonce": self.nonce,
-            "merkle_root": self.merkle_root
+            "merkle_root": self.merkle_root,
+            "hash": self.hash
         }
 
+    def header_dict(self):
+        """Everything needed to check linkage and proof-of-work, without the transactions."""
+        return {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "previous_hash": self.previous_hash,
+            "nonce": self.nonce,
+            "merkle_root": self.merkle_root,
+            "hash": self.hash
+        }
+
+    @classmethod
+    def from_header(cls, header):
+        """A transaction-less Block whose hash can be checked against the header fields."""
+        return cls(
+            index=header['index'],
+            transactions=[],
+            previous_hash=header['previous_hash'],
+            timestamp=header['timestamp'],
+            nonce=header['nonce'],
+            merkle_root=header['merkle_root'],
+            block_hash=header.get('hash')
+        )
+
+    def to_bytes(self):
+        """Compact binary encoding; see blockchain/serialization.py."""
+        return encode_block(self)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.from_dict(decode_block(data))
+
     @classmethod
     def from_dict(cls, block_data):
         return cls(
@@ -54,5 +138,6 @@ class Block:
             previous_hash=block_data['previous_hash'],
             timestamp=block_data['timestamp'],
             nonce=block_data['nonce'],
-            merkle_root=block_data.get('merkle_root')
+            merkle_root=block_data.get('merkle_root'),
+            block_hash=block_data.get('hash')
         )
@@ -0,0 +1,159 @@
+import logging
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from monitoring import metrics
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_SECONDS = metrics.histogram("blockchain_broadcast_seconds", "Time to deliver one message to one peer, by path.",
+                                      ["node", "path"])
+BROADCAST_MESSAGES = metrics.counter("blockchain_broadcast_messages_total",
+                                     "Peer messages by outcome: sent, failed, dropped or skipped.", ["node", "result"])
+
+
+class _PeerState:
+    __slots__ = ('session', 'failures', 'open_until')
+
+    def __init__(self, pool_size):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.failures = 0
+        self.open_until = 0.0
+
+
+class Broadcaster:
+    """Delivers POSTs to peers from a bounded queue on a small pool of threads.
+
+    broadcast() only enqueues one job per peer and returns, so request handlers
+    and the miner never wait on the network; a full queue drops the message.
+    Each peer gets its own keep-alive Session. After `failure_threshold`
+    consecutive failures a peer's circuit opens and messages for it are skipped
+    for an exponentially growing backoff (capped at `max_backoff`); once that
+    expires messages are let through again, and another failure reopens it for
+    twice as long.
+    """
+
+    def __init__(self, workers=4, queue_size=1000, timeout=5, failure_threshold=3,
+                 base_backoff=1.0, max_backoff=60.0, node=""):
+        self.workers = workers
+        self.node = node
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.skipped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._peers = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _peer(self, peer):
+        with self._lock:
+            state = self._peers.get(peer)
+            if state is None:
+                state = self._peers[peer] = _PeerState(self.workers)
+            return state
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._run, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def broadcast(self, peers, path, payload):
+        """Queue `payload` as JSON for POST {peer}{path} on every peer; returns immediately."""
+        self._start()
+        now = time.time()
+        for peer in peers:
+            if self._peer(peer).open_until > now:
+                self._count('skipped')
+                continue
+            try:
+                self._queue.put_nowait((peer, path, payload))
+            except queue.Full:
+                self._count('dropped')
+                logger.warning("Broadcast queue full; dropping %s for %s", path, peer)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._send(*job)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, peer, path, payload):
+        state = self._peer(peer)
+        if state.open_until > time.time():
+            self._count('skipped')
+            return
+        started = time.perf_counter()
+        try:
+            response = state.session.post(f'{peer}{path}', json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._record_failure(peer, state, e)
+            return
+        finally:
+            BROADCAST_SECONDS.labels(node=self.node, path=path).observe(time.perf_counter() - started)
+        if response.status_code >= 500:
+            self._record_failure(peer, state, f"HTTP {response.status_code}")
+            return
+        state.failures = 0
+        state.open_until = 0.0
+        self._count('sent')
+        if response.status_code >= 400:
+            # The peer is up but rejected the message (e.g. an invalid or stale block).
+            logger.warning("Peer %s rejected %s: %s", peer, path, response.text)
+
+    def _count(self, counter):
+        BROADCAST_MESSAGES.labels(node=self.node, result=counter).inc()
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _record_failure(self, peer, state, error):
+        self._count('failed')
+        state.failures += 1
+        if state.failures >= self.failure_threshold:
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (state.failures - self.failure_threshold))
+            state.open_until = time.time() + backoff
+            logger.warning("Error broadcasting %s: %s; pausing for %.0fs", peer, error, backoff)
+        else:
+            logger.warning("Error broadcasting %s: %s", peer, error)
+
+    def join(self):
+        """Block until every queued message has been attempted."""
+        self._queue.join()
+
+    def stats(self):
+        now = time.time()
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "queued": self._queue.qsize(),
+            "open_circuits": [peer for peer, state in self._peers.items() if state.open_until > now]
+        }
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for state in self._peers.values():
+            state.session.close()
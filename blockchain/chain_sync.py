@@ -0,0 +1,173 @@
+import json
+import logging
+import requests
+from blockchain.block import Block
+from blockchain.serialization import BINARY_MIMETYPE, NDJSON_MIMETYPE, decode_blocks, iter_decode_blocks
+from monitoring import metrics
+
+logger = logging.getLogger(__name__)
+
+SYNC_SECONDS = metrics.histogram("blockchain_chain_sync_seconds", "Duration of one headers-first sync round with a peer.",
+                                 ["node"], buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+SYNC_BLOCKS = metrics.counter("blockchain_chain_sync_blocks_total", "Blocks applied by headers-first sync.", ["node"])
+
+
+class ChainSynchronizer:
+    """Headers-first sync that downloads only the blocks a node is missing.
+
+    A round asks the peer for its tip, locates the fork point by comparing header
+    hashes with our own blocks, checks linkage and proof-of-work on the headers,
+    and only then fetches bodies for that range. Blocks are applied straight to the
+    Blockchain instance. Headers and blocks are requested in the binary encoding,
+    falling back to JSON for peers that do not offer it.
+    """
+
+    def __init__(self, blockchain, header_batch=2000, block_batch=100, timeout=5, binary=True):
+        self.blockchain = blockchain
+        self.binary = binary
+        self.header_batch = header_batch
+        self.block_batch = block_batch
+        self.timeout = timeout
+
+    def _get(self, peer, path, **params):
+        response = requests.get(f'{peer}{path}', params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _get_blocks(self, peer, path, key, start, end):
+        """Block dicts for a range, in the binary encoding when the peer supports it."""
+        accept = f'{BINARY_MIMETYPE}, application/json;q=0.5' if self.binary else 'application/json'
+        response = requests.get(f'{peer}{path}', params={'from': start, 'to': end},
+                                headers={'Accept': accept}, timeout=self.timeout)
+        response.raise_for_status()
+        if response.headers.get('Content-Type', '').startswith(BINARY_MIMETYPE):
+            return decode_blocks(response.content)
+        return response.json()[key]
+
+    def fetch_headers(self, peer, start, end):
+        headers = []
+        while start <= end:
+            batch_end = min(end, start + self.header_batch - 1)
+            batch = self._get_blocks(peer, '/headers', 'headers', start, batch_end)
+            if not batch:
+                break
+            headers.extend(batch)
+            start = batch[-1]['index'] + 1
+        return headers
+
+    def fetch_blocks(self, peer, start, end):
+        blocks = []
+        while start <= end:
+            batch_end = min(end, start + self.block_batch - 1)
+            batch = self._get_blocks(peer, '/blocks', 'blocks', start, batch_end)
+            if not batch:
+                break
+            blocks.extend(Block.from_dict(block_data) for block_data in batch)
+            start = blocks[-1].index + 1
+        return blocks
+
+    def stream_blocks(self, peer, start, end):
+        """Yield Blocks for a height range from the peer's streaming /chain endpoint as they arrive."""
+        accept = f'{NDJSON_MIMETYPE}, application/json;q=0.5'
+        if self.binary:
+            accept = f'{BINARY_MIMETYPE}, {accept}'
+        with requests.get(f'{peer}/chain', params={'from': start, 'to': end}, headers={'Accept': accept},
+                          stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if content_type.startswith(BINARY_MIMETYPE):
+                blocks = iter_decode_blocks(response.iter_content(chunk_size=65536))
+            elif content_type.startswith(NDJSON_MIMETYPE):
+                blocks = (json.loads(line) for line in response.iter_lines() if line)
+            else:
+                # A peer without streaming support sends its whole chain as one document.
+                blocks = response.json()
+            for block_data in blocks:
+                if start <= block_data['index'] <= end:
+                    yield Block.from_dict(block_data)
+
+    def import_stream(self, peer, headers):
+        """Apply streamed blocks on top of our tip as they arrive; returns how many were applied.
+
+        Each block must match its already validated header and pass add_block;
+        the stream is abandoned at the first one that does not.
+        """
+        applied = 0
+        for block in self.stream_blocks(peer, headers[0]['index'], headers[-1]['index']):
+            if block.hash != headers[applied]['hash']:
+                logger.warning("Peer %s sent a block that does not match its header.", peer)
+                break
+            if not self.blockchain.add_block(block):
+                break
+            applied += 1
+        return applied
+
+    def find_fork_point(self, peer, peer_height):
+        """Height of the first block we do not share with the peer, or None if genesis differs.
+
+        Starts by comparing the single header at the lower of the two tips and
+        doubles the window backwards until a shared block is found.
+        """
+        chain = self.blockchain.chain
+        shared_height = min(len(chain) - 1, peer_height)
+        window = 1
+        while True:
+            start = max(0, shared_height - window + 1)
+            for header in reversed(self.fetch_headers(peer, start, shared_height)):
+                if header['hash'] == chain[header['index']].hash:
+                    return header['index'] + 1
+            if start == 0:
+                return None
+            shared_height = start - 1
+            window *= 2
+
+    def validate_headers(self, headers, previous_hash):
+        """Check index continuity, linkage and proof-of-work before any body is downloaded."""
+        difficulty_target = '0' * self.blockchain.difficulty
+        expected_index = headers[0]['index'] if headers else 0
+        for header in headers:
+            block = Block.from_header(header)
+            if block.index != expected_index or block.previous_hash != previous_hash:
+                return False
+            if not block.hash.startswith(difficulty_target):
+                return False
+            previous_hash = block.hash
+            expected_index += 1
+        return True
+
+    def sync_with_peer(self, peer):
+        """Bring our chain up to the peer's tip; returns the number of blocks applied."""
+        with SYNC_SECONDS.labels(node=self.blockchain.node).time():
+            applied = self._sync_with_peer(peer)
+        SYNC_BLOCKS.labels(node=self.blockchain.node).inc(applied)
+        return applied
+
+    def _sync_with_peer(self, peer):
+        tip = self._get(peer, '/chain/tip')
+        self.blockchain.observe_peer_height(tip['height'])
+        if tip['height'] <= self.blockchain.chain[-1].index:
+            # Only a strictly longer chain can replace ours.
+            return 0
+
+        fork_index = self.find_fork_point(peer, tip['height'])
+        if fork_index is None:
+            logger.warning("Peer %s has a different genesis block; not syncing.", peer)
+            return 0
+
+        headers = self.fetch_headers(peer, fork_index, tip['height'])
+        if not headers or not self.validate_headers(headers, self.blockchain.chain[fork_index - 1].hash):
+            logger.warning("Peer %s sent invalid headers.", peer)
+            return 0
+
+        if fork_index == len(self.blockchain.chain):
+            return self.import_stream(peer, headers)
+
+        blocks = self.fetch_blocks(peer, fork_index, headers[-1]['index'])
+        if [block.hash for block in blocks] != [header['hash'] for header in headers[:len(blocks)]]:
+            logger.warning("Peer %s sent blocks that do not match its headers.", peer)
+            return 0
+
+        candidate = self.blockchain.chain[:fork_index] + blocks
+        if self.blockchain.replace_chain(candidate):
+            return len(blocks)
+        return 0
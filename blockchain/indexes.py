@@ -0,0 +1,182 @@
+from bisect import bisect_left, bisect_right
+
+
+class TransactionIndex:
+    """Maps transaction_id -> (block index, position in block) for the current chain.
+
+    Signatures are indexed by block too, so a confirmed transfer is recognised
+    under any transaction_id. Should an id or signature repeat (only chains
+    accepted before replays were rejected can hold one), the earliest block
+    keeps it; truncating a later block then never drops the live entry.
+    """
+
+    def __init__(self):
+        self._locations = {}
+        self._block_ids = {}
+        self._signatures = {}
+        self._block_signatures = {}
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._locations
+
+    def __len__(self):
+        return len(self._locations)
+
+    def get(self, transaction_id):
+        return self._locations.get(transaction_id)
+
+    def signature_height(self, signature):
+        """Index of the block that confirmed `signature`, or None."""
+        return self._signatures.get(signature)
+
+    def add_block(self, block):
+        ids = []
+        signatures = []
+        for position, tx in enumerate(block.transactions):
+            transaction_id = tx.get('transaction_id')
+            if transaction_id is not None and transaction_id not in self._locations:
+                self._locations[transaction_id] = (block.index, position)
+                ids.append(transaction_id)
+            signature = tx.get('signature')
+            if signature is not None and signature not in self._signatures:
+                self._signatures[signature] = block.index
+                signatures.append(signature)
+        self._block_ids[block.index] = ids
+        self._block_signatures[block.index] = signatures
+
+    def truncate(self, height):
+        """Forget every block at or above height, e.g. before applying a fork."""
+        for index in [index for index in self._block_ids if index >= height]:
+            for transaction_id in self._block_ids.pop(index):
+                del self._locations[transaction_id]
+            for signature in self._block_signatures.pop(index, ()):
+                del self._signatures[signature]
+
+    def rebuild(self, chain):
+        self._locations = {}
+        self._block_ids = {}
+        self._signatures = {}
+        self._block_signatures = {}
+        for block in chain:
+            self.add_block(block)
+
+    def copy(self):
+        """An independent copy; the per-block lists are never changed in place, so they are shared."""
+        index = TransactionIndex()
+        index._locations = dict(self._locations)
+        index._block_ids = dict(self._block_ids)
+        index._signatures = dict(self._signatures)
+        index._block_signatures = dict(self._block_signatures)
+        return index
+
+    def to_dict(self):
+        """Flat arrays grouped by block, which restore() turns back into dicts without a Python-level loop per id."""
+        ids, positions, runs = [], [], []
+        for block_index in sorted(self._block_ids):
+            block_ids = self._block_ids[block_index]
+            ids.extend(block_ids)
+            positions.extend(self._locations[transaction_id][1] for transaction_id in block_ids)
+            runs.append([block_index, len(block_ids)])
+        signatures, signature_runs = [], []
+        for block_index in sorted(self._block_signatures):
+            signatures.extend(self._block_signatures[block_index])
+            signature_runs.append([block_index, len(self._block_signatures[block_index])])
+        return {"ids": ids, "positions": positions, "runs": runs,
+                "signatures": signatures, "signature_runs": signature_runs}
+
+    def restore(self, data):
+        """Replace the index with one saved by to_dict(), e.g. from a startup snapshot."""
+        self._block_ids, blocks = self._unflatten(data["ids"], data["runs"])
+        self._locations = dict(zip(data["ids"], zip(blocks, data["positions"])))
+        self._block_signatures, blocks = self._unflatten(data["signatures"], data["signature_runs"])
+        self._signatures = dict(zip(data["signatures"], blocks))
+
+    @staticmethod
+    def _unflatten(values, runs):
+        """Per-block lists from a flat list and its [block, count] runs, plus each value's block."""
+        by_block = {}
+        blocks = []
+        offset = 0
+        for block_index, count in runs:
+            by_block[block_index] = values[offset:offset + count]
+            blocks.extend([block_index] * count)
+            offset += count
+        return by_block, blocks
+
+
+class AddressIndex:
+    """Per-address postings (block index, position) of every transaction sent or received.
+
+    Blocks are appended in height order, so each postings list stays sorted and
+    pages can be located with a binary search.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._block_addresses = {}
+
+    def add_block(self, block):
+        touched = set()
+        for position, tx in enumerate(block.transactions):
+            for address in {tx['sender'], tx['recipient']}:
+                self._postings.setdefault(address, []).append((block.index, position))
+                touched.add(address)
+        self._block_addresses[block.index] = touched
+
+    def truncate(self, height):
+        """Forget every block at or above height, e.g. before applying a fork."""
+        for index in [index for index in self._block_addresses if index >= height]:
+            for address in self._block_addresses.pop(index):
+                postings = self._postings.get(address)
+                if postings is None:
+                    # Already emptied while truncating an earlier block.
+                    continue
+                while postings and postings[-1][0] >= height:
+                    postings.pop()
+                if not postings:
+                    del self._postings[address]
+
+    def rebuild(self, chain):
+        self._postings = {}
+        self._block_addresses = {}
+        for block in chain:
+            self.add_block(block)
+
+    def copy(self):
+        """An independent copy; postings lists are copied because blocks append to them in place."""
+        index = AddressIndex()
+        index._postings = {address: list(postings) for address, postings in self._postings.items()}
+        index._block_addresses = dict(self._block_addresses)
+        return index
+
+    def to_dict(self):
+        """Postings as flat [block, position, block, position, ...] lists per address."""
+        return {
+            "postings": {address: [value for posting in postings for value in posting]
+                         for address, postings in self._postings.items()},
+            "block_addresses": {index: list(addresses) for index, addresses in self._block_addresses.items()}
+        }
+
+    def restore(self, data):
+        """Replace the index with one saved by to_dict(), e.g. from a startup snapshot."""
+        self._postings = {address: list(zip(flat[::2], flat[1::2])) for address, flat in data["postings"].items()}
+        self._block_addresses = {int(index): set(addresses) for index, addresses in data["block_addresses"].items()}
+
+    def query(self, address, since_block=0, cursor=None, limit=100):
+        """Return (postings, next_cursor) for up to `limit` postings after `cursor`.
+
+        A cursor is the "<block>:<position>" of the last posting already returned.
+        Raises ValueError for a limit below 1 or a negative since_block.
+        """
+        if limit < 1 or since_block < 0:
+            raise ValueError("limit must be at least 1 and since_block not negative")
+        postings = self._postings.get(address, [])
+        start = bisect_left(postings, (since_block, 0))
+        if cursor:
+            block_index, position = (int(part) for part in cursor.split(':'))
+            start = max(start, bisect_right(postings, (block_index, position)))
+        page = postings[start:start + limit]
+        next_cursor = None
+        if page and start + limit < len(postings):
+            next_cursor = f"{page[-1][0]}:{page[-1][1]}"
+        return page, next_cursor
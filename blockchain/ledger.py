@@ -0,0 +1,125 @@
+from collections import ChainMap, OrderedDict
+
+
+class Ledger:
+    """Per-block balance deltas (undo data) and periodic balance snapshots.
+
+    The balances themselves live in Blockchain.wallets; the ledger records what
+    each recent block changed so a reorg only has to undo blocks back to the fork
+    point, and keeps snapshots keyed by height so a cold recomputation can start
+    from the nearest one instead of from genesis.
+    """
+
+    def __init__(self, undo_depth=1000, snapshot_interval=1000, max_snapshots=4):
+        self.undo_depth = undo_depth
+        self.snapshot_interval = snapshot_interval
+        self.max_snapshots = max_snapshots
+        self._undo = OrderedDict()
+        self._snapshots = OrderedDict()
+
+    @staticmethod
+    def block_deltas(block):
+        deltas = {}
+        for tx in block.transactions:
+            sender = tx['sender']
+            recipient = tx['recipient']
+            amount = tx['amount']
+            if sender != "ICO":
+                deltas[sender] = deltas.get(sender, 0) - amount
+            deltas[recipient] = deltas.get(recipient, 0) + amount
+        return deltas
+
+    @staticmethod
+    def _add(balances, deltas, sign):
+        for address, delta in deltas.items():
+            balances[address] = balances.get(address, 0) + sign * delta
+
+    def apply_block(self, balances, block):
+        """Apply a block to `balances` and keep its deltas as undo data."""
+        deltas = self.record_undo(block)
+        self._add(balances, deltas, 1)
+        if block.index % self.snapshot_interval == 0:
+            self._snapshots[block.index] = dict(balances)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return deltas
+
+    def record_undo(self, block):
+        """Keep undo data for a block without applying it, e.g. one already in loaded balances."""
+        deltas = self.block_deltas(block)
+        self._undo[block.index] = deltas
+        while len(self._undo) > self.undo_depth:
+            self._undo.popitem(last=False)
+        return deltas
+
+    def rollback(self, balances, tip_height, fork_index):
+        """Undo blocks fork_index..tip_height; returns False if the undo data does not reach back that far."""
+        heights = range(tip_height, fork_index - 1, -1)
+        if any(height not in self._undo for height in heights):
+            return False
+        for height in heights:
+            self._add(balances, self._undo.pop(height), -1)
+        for height in [height for height in self._snapshots if height >= fork_index]:
+            del self._snapshots[height]
+        return True
+
+    def recompute(self, chain, genesis_balances, fork_index=None):
+        """Cold recomputation from the nearest snapshot below `fork_index` (default: the tip).
+
+        Snapshots at or above the fork point belong to the replaced branch and are dropped.
+        """
+        if fork_index is None:
+            fork_index = len(chain)
+        for height in [height for height in self._snapshots if height >= fork_index]:
+            del self._snapshots[height]
+        start, balances = 0, dict(genesis_balances)
+        if self._snapshots:
+            start = next(reversed(self._snapshots))
+            balances = dict(self._snapshots[start])
+        self._undo.clear()
+        for block in chain[start + 1:]:
+            self.apply_block(balances, block)
+        return balances
+
+    def balances_at(self, balances, tip_height, fork_index):
+        """Read-only view of `balances` as they were before block fork_index, or None.
+
+        Built from the undo data as an overlay, so the live balances are not copied.
+        Returns None when the undo data does not reach back to fork_index.
+        """
+        overlay = {}
+        for height in range(tip_height, fork_index - 1, -1):
+            deltas = self._undo.get(height)
+            if deltas is None:
+                return None
+            for address, delta in deltas.items():
+                overlay[address] = overlay.get(address, balances.get(address, 0)) - delta
+        return ChainMap(overlay, balances)
+
+    def replay(self, chain, genesis_balances):
+        """Balances after `chain`, computed from scratch without touching the ledger state."""
+        balances = dict(genesis_balances)
+        for block in chain[1:]:
+            self._add(balances, self.block_deltas(block), 1)
+        return balances
+
+    def rebuild_undo(self, chain):
+        """Recreate undo data for the most recent blocks, e.g. after loading a checkpoint."""
+        self._undo.clear()
+        for block in chain[max(1, len(chain) - self.undo_depth):]:
+            self._undo[block.index] = self.block_deltas(block)
+
+    def to_dict(self):
+        return {"undo": self._undo, "snapshots": self._snapshots}
+
+    def copy(self):
+        """An independent copy; stored deltas and balance snapshots are never changed, so they are shared."""
+        ledger = Ledger(self.undo_depth, self.snapshot_interval, self.max_snapshots)
+        ledger._undo = OrderedDict(self._undo)
+        ledger._snapshots = OrderedDict(self._snapshots)
+        return ledger
+
+    def restore(self, data):
+        """Replace undo data and balance snapshots with ones saved by to_dict()."""
+        self._undo = OrderedDict((int(height), deltas) for height, deltas in data["undo"].items())
+        self._snapshots = OrderedDict((int(height), balances) for height, balances in data["snapshots"].items())
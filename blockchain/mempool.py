@@ -0,0 +1,183 @@
+import heapq
+import json
+import logging
+import time
+from blockchain.validation import check_amount, check_identifiers
+
+logger = logging.getLogger(__name__)
+
+
+class Mempool:
+    """Pending transactions with count/byte caps, age eviction and per-sender accounting.
+
+    Transactions are kept in a dict in arrival order, so lookups and removal of
+    mined transactions are O(1) and the oldest entry is always first. Signatures
+    are indexed too, so a signed transfer resubmitted under a new transaction_id
+    is recognised as a duplicate. The amount
+    each sender already has pending is tracked so an overspend can be rejected at
+    admission with one lookup. There are no fees in the transaction format, so
+    the transferred amount is the priority: block templates take the highest
+    amounts first (ties in arrival order) and a full pool evicts the lowest.
+    """
+
+    def __init__(self, max_transactions=10000, max_bytes=5000000, max_age=3600):
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.total_bytes = 0
+        self._transactions = {}
+        self._entries = {}
+        self._signatures = {}
+        self._pending_spend = {}
+        self._eviction_heap = []
+        self._seq = 0
+        # Bumped on every change, so readers can tell whether a copy is stale.
+        self.version = 0
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._transactions
+
+    def __len__(self):
+        return len(self._transactions)
+
+    def __iter__(self):
+        return iter(self._transactions)
+
+    def get(self, transaction_id, default=None):
+        return self._transactions.get(transaction_id, default)
+
+    def values(self):
+        """Transactions in arrival order."""
+        return self._transactions.values()
+
+    def pending_spend(self, sender):
+        return self._pending_spend.get(sender, 0)
+
+    def add(self, transaction, balance=None, now=None):
+        """Admit a transaction; returns False if it, or its signature, is already pending.
+
+        When `balance` is given, the sender's confirmed balance minus what it
+        already has pending must cover the amount. Raises ValueError for a
+        transaction_id or signature that is not a string, an amount that is not
+        a positive number, an overspend, or when the pool is full of
+        higher-priority transactions.
+        """
+        error = check_identifiers(transaction)
+        if error:
+            raise ValueError(error)
+        transaction_id = transaction['transaction_id']
+        if transaction_id in self._transactions or transaction['signature'] in self._signatures:
+            return False
+        error = check_amount(transaction)
+        if error:
+            raise ValueError(error)
+        now = time.time() if now is None else now
+        self.evict_expired(now)
+        sender = transaction['sender']
+        amount = transaction['amount']
+        if balance is not None and balance - self.pending_spend(sender) < amount:
+            raise ValueError("Insufficient funds")
+        size = len(json.dumps(transaction))
+        self._seq += 1
+        priority = (amount, -self._seq)
+        if not self._make_room(size, priority):
+            raise ValueError("Mempool full")
+        self._transactions[transaction_id] = transaction
+        self._entries[transaction_id] = (size, now, priority)
+        self._signatures[transaction['signature']] = transaction_id
+        self._pending_spend[sender] = self.pending_spend(sender) + amount
+        self.total_bytes += size
+        heapq.heappush(self._eviction_heap, (priority, transaction_id))
+        self.version += 1
+        return True
+
+    def pop(self, transaction_id, default=None):
+        transaction = self._transactions.pop(transaction_id, None)
+        if transaction is None:
+            return default
+        size, _, _ = self._entries.pop(transaction_id)
+        del self._signatures[transaction['signature']]
+        self.total_bytes -= size
+        self.version += 1
+        sender = transaction['sender']
+        remaining = self._pending_spend[sender] - transaction['amount']
+        if remaining > 0:
+            self._pending_spend[sender] = remaining
+        else:
+            del self._pending_spend[sender]
+        if len(self._eviction_heap) > 2 * len(self._transactions) + 64:
+            # Drop heap entries of transactions that already left the pool.
+            self._eviction_heap = [item for item in self._eviction_heap if item[1] in self._transactions]
+            heapq.heapify(self._eviction_heap)
+        return transaction
+
+    def remove_many(self, transaction_ids):
+        for transaction_id in transaction_ids:
+            self.pop(transaction_id)
+
+    def remove_confirmed(self, transactions):
+        """Drop mined transactions, and any pending entry that reuses one of their signatures."""
+        for transaction in transactions:
+            self.pop(transaction.get('transaction_id'))
+            replay = self._signatures.get(transaction.get('signature'))
+            if replay is not None:
+                logger.debug("Dropping transaction %s; its signature was mined", replay)
+                self.pop(replay)
+
+    def clear(self):
+        self.total_bytes = 0
+        self._transactions.clear()
+        self._entries.clear()
+        self._signatures.clear()
+        self._pending_spend.clear()
+        self._eviction_heap = []
+        self.version += 1
+
+    def evict_expired(self, now=None):
+        """Drop transactions older than max_age; returns how many were dropped."""
+        if not self.max_age:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.max_age
+        expired = []
+        for transaction_id in self._transactions:
+            if self._entries[transaction_id][1] > cutoff:
+                break
+            expired.append(transaction_id)
+        self.remove_many(expired)
+        return len(expired)
+
+    def _make_room(self, size, priority):
+        """Evict lower-priority transactions until `size` more bytes fit; False if they cannot.
+
+        Nothing is evicted for a transaction larger than the whole pool, and a
+        newcomer never displaces an entry of equal priority.
+        """
+        if size > self.max_bytes:
+            return False
+        while self._transactions and (
+            len(self._transactions) >= self.max_transactions
+            or self.total_bytes + size > self.max_bytes
+        ):
+            while self._eviction_heap[0][1] not in self._transactions:
+                heapq.heappop(self._eviction_heap)
+            lowest_priority, transaction_id = self._eviction_heap[0]
+            if lowest_priority >= priority:
+                return False
+            heapq.heappop(self._eviction_heap)
+            logger.debug("Mempool full; evicting transaction %s", transaction_id)
+            self.pop(transaction_id)
+        return True
+
+    def select(self, max_transactions=None, max_bytes=None):
+        """Block template: highest priority first, deterministic for a given pool."""
+        ordered = sorted(self._transactions, key=lambda transaction_id: self._entries[transaction_id][2], reverse=True)
+        selected, size = [], 0
+        for transaction_id in ordered:
+            if max_transactions is not None and len(selected) >= max_transactions:
+                break
+            tx_size = self._entries[transaction_id][0]
+            if max_bytes is not None and selected and size + tx_size > max_bytes:
+                break
+            selected.append(self._transactions[transaction_id])
+            size += tx_size
+        return selected
@@ -1,21 +1,75 @@
-from cryptolib.crypto import Crypto
+import hashlib
+import json
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def transaction_bytes(transaction):
+    """Canonical encoding of a transaction dict: sorted keys, no whitespace."""
+    return json.dumps(transaction, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def leaf_hash(transaction):
+    return hashlib.sha256(LEAF_PREFIX + transaction_bytes(transaction)).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
 
 
 class MerkleTree:
+    """Merkle tree over canonical transaction bytes.
+
+    Levels are built bottom-up and kept (as raw digests) so inclusion proofs can
+    be produced without rehashing; hex is only used for the root and proofs.
+    Leaves and inner nodes are hashed with different prefixes, and an odd node
+    is paired with itself.
+    """
+
     def __init__(self, transactions):
         self.transactions = transactions
-        transaction_hashes = [Crypto.hash(str(tx)) for tx in transactions]
-        self.root = self.build_merkle_tree(transaction_hashes)
-
-    def build_merkle_tree(self, hashes):
-        if not hashes:
-            return None
-        if len(hashes) == 1:
-            return hashes[0]
-        new_level = []
-        for i in range(0, len(hashes), 2):
-            left = hashes[i]
-            right = hashes[i + 1] if i + 1 < len(hashes) else left
-            combined_hash = Crypto.hash(left + right)
-            new_level.append(combined_hash)
-        return self.build_merkle_tree(new_level)
+        self.levels = self._build([leaf_hash(tx) for tx in transactions])
+        self.root = self.levels[-1][0].hex() if self.levels else None
+
+    @staticmethod
+    def _build(leaves):
+        if not leaves:
+            return []
+        levels = [leaves]
+        while len(levels[-1]) > 1:
+            level = levels[-1]
+            levels.append([
+                node_hash(level[i], level[i + 1] if i + 1 < len(level) else level[i])
+                for i in range(0, len(level), 2)
+            ])
+        return levels
+
+    def proof(self, position):
+        """Sibling hashes from the leaf at `position` up to the root.
+
+        Each step is {"hash": hex, "side": "left" | "right"}, the side the
+        sibling sits on when it is combined with the running hash.
+        """
+        if not 0 <= position < len(self.transactions):
+            raise IndexError("transaction position out of range")
+        steps = []
+        for level in self.levels[:-1]:
+            if position % 2:
+                steps.append({"hash": level[position - 1].hex(), "side": "left"})
+            else:
+                sibling = level[position + 1] if position + 1 < len(level) else level[position]
+                steps.append({"hash": sibling.hex(), "side": "right"})
+            position //= 2
+        return steps
+
+    @staticmethod
+    def verify_proof(transaction, proof, root):
+        current = leaf_hash(transaction)
+        for step in proof:
+            sibling = bytes.fromhex(step["hash"])
+            if step["side"] == "left":
+                current = node_hash(sibling, current)
+            else:
+                current = node_hash(current, sibling)
+        return current.hex() == root
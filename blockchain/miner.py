@@ -0,0 +1,109 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+_stop_event = None
+
+
+def _init_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+
+def find_nonce(header_prefix, difficulty, start_nonce=0, step=1, should_stop=None, check_every=4096):
+    """Search start_nonce, start_nonce + step, ... for a hash with `difficulty` leading zeros.
+
+    The constant header prefix is fed into SHA-256 once and the state is copied for
+    every nonce, so each attempt only hashes the nonce digits. Returns a
+    (nonce, hash, attempts) tuple; nonce is None if should_stop() became true first.
+    """
+    target = '0' * difficulty
+    prefix_state = hashlib.sha256(header_prefix.encode('utf-8'))
+    nonce = start_nonce
+    attempts = 0
+    while True:
+        for _ in range(check_every):
+            state = prefix_state.copy()
+            state.update(str(nonce).encode('utf-8'))
+            digest = state.hexdigest()
+            attempts += 1
+            if digest.startswith(target):
+                return nonce, digest, attempts
+            nonce += step
+        if should_stop is not None and should_stop():
+            return None, None, attempts
+
+
+def _mine_partition(header_prefix, difficulty, start_nonce, step):
+    result = find_nonce(header_prefix, difficulty, start_nonce, step, should_stop=_stop_event.is_set)
+    if result[0] is not None:
+        _stop_event.set()
+    return result
+
+
+class ParallelMiner:
+    """Proof-of-work search spread over a pool of worker processes.
+
+    Worker k of n tries nonces start + k, start + k + n, ... so the partitions never
+    overlap. The first worker to find a solution sets a shared event that stops the
+    others; cancel() sets the same event from outside, e.g. when a competing block
+    arrives from a peer.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.last_hashrate = 0.0
+        self.last_duration = 0.0
+        self.last_attempts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self._stop_event,)
+            )
+        return self._executor
+
+    def mine(self, header_prefix, difficulty, start_nonce=0):
+        """Return a nonce solving the header, or None if the search was cancelled."""
+        with self._lock:
+            self._stop_event.clear()
+            started = time.perf_counter()
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_mine_partition, header_prefix, difficulty, start_nonce + k, self.workers)
+                for k in range(self.workers)
+            ]
+            solutions = []
+            attempts = 0
+            for future in as_completed(futures):
+                nonce, _, worker_attempts = future.result()
+                attempts += worker_attempts
+                if nonce is not None:
+                    solutions.append(nonce)
+            self._stop_event.clear()
+
+            self.last_duration = time.perf_counter() - started
+            self.last_attempts = attempts
+            self.last_hashrate = attempts / self.last_duration if self.last_duration > 0 else 0.0
+            return min(solutions) if solutions else None
+
+    def cancel(self):
+        """Stop the search in progress, if any."""
+        self._stop_event.set()
+
+    def shutdown(self):
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -1,220 +1,385 @@
+import logging
 import threading
 import asyncio
 import json
+import time
+from collections import OrderedDict
 from blockchain.block import Block
 import websockets
-from blockchain.transaction import Transaction
+from blockchain.serialization import decode_blocks, encode_blocks
+from monitoring import metrics
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_RECEIVED = metrics.counter("blockchain_p2p_messages_received_total", "Gossip messages received, by type.",
+                                    ["node", "type"])
+SEND_SECONDS = metrics.histogram("blockchain_p2p_send_seconds", "Time to hand one gossip message to a peer's socket.",
+                                 ["node"])
+
+# First byte of a binary frame; the rest is an encode_blocks() payload.
+BINARY_BLOCK = 1
+BINARY_BLOCKS = 2
+
+# Most blocks sent in answer to one GETBLOCKS, whatever limit the requester asks for.
+MAX_BLOCKS_PER_BATCH = 500
+
+
+class SeenCache:
+    """Bounded set of recently seen inventory keys; the oldest are forgotten first."""
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def add(self, key):
+        """Remember `key`; returns False if it was already known."""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+        return True
+
 
 class P2PNetwork:
-    def __init__(self, host='0.0.0.0', port=5001, blockchain=None):
+    """WebSocket gossip between nodes.
+
+    New blocks and transactions are announced by hash (INV); a peer fetches only
+    the objects it does not have (GETDATA) and relays them onward once they are
+    accepted. A seen-hash cache keeps an object from being fetched or relayed
+    twice. A peer that is behind, or receives a block whose parent it lacks,
+    catches up with GETBLOCKS: it sends a locator of its own block hashes and
+    gets batches of blocks from the first one the peer shares.
+    """
+
+    def __init__(self, host='0.0.0.0', port=5001, blockchain=None, seeds=None,
+                 reconnect_interval=10, batch_size=100, request_timeout=5):
+        if not 0 < batch_size <= MAX_BLOCKS_PER_BATCH:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BLOCKS_PER_BATCH}")
         self.host = host
         self.port = port
         self.blockchain = blockchain
         self.peers = []
+        # Peers that announced support for binary block frames in their HELLO.
+        self.binary_peers = set()
+        self.seeds = list(seeds or [])
+        self.reconnect_interval = reconnect_interval
+        self.batch_size = batch_size
+        self.request_timeout = request_timeout
+        self.seen = SeenCache()
         self.loop = None
         self.loop_ready = threading.Event()
+        self._outbound = {}
+        self._in_flight = {}
+        self._recent_blocks = OrderedDict()
+        self._catchup = {}
 
     def start(self):
-        """Start the WebSocket server in a separate event loop."""
+        """Start the WebSocket server, and the seed connections, in a separate event loop."""
         self.loop = asyncio.new_event_loop()
-        self.loop_ready = threading.Event()  # Add this line
+
+        async def serve():
+            await websockets.serve(self.handle_connection, self.host, self.port, max_size=2 ** 24)
 
         def run_server():
             asyncio.set_event_loop(self.loop)
-            start_server = websockets.serve(self.handle_connection, self.host, self.port)
-            self.loop.run_until_complete(start_server)
-            self.loop_ready.set()  # Signal that the loop is ready
+            self.loop.run_until_complete(serve())
+            self.loop.create_task(self._maintain_connections())
+            self.loop_ready.set()
             self.loop.run_forever()
 
         threading.Thread(target=run_server, daemon=True).start()
-        print(f"P2P Network server started on {self.host}:{self.port}")
-
+        logger.info("P2P Network server started on %s:%s", self.host, self.port)
 
+    def connect_to_peer(self, host, port):
+        """Connect to a new peer via WebSocket and keep reconnecting to it."""
+        self.loop_ready.wait()
+        uri = f"ws://{host}:{port}"
+        if uri not in self.seeds:
+            self.seeds.append(uri)
+        asyncio.run_coroutine_threadsafe(self._connect(uri), self.loop)
+
+    async def _maintain_connections(self):
+        while True:
+            for uri in list(self.seeds):
+                if uri not in self._outbound:
+                    await self._connect(uri)
+            await asyncio.sleep(self.reconnect_interval)
+
+    async def _connect(self, uri):
+        if uri in self._outbound:
+            return
+        try:
+            websocket = await websockets.connect(uri, max_size=2 ** 24)
+        except Exception as e:
+            logger.warning("Failed to connect to peer at %s: %s", uri, e)
+            return
+        self._outbound[uri] = websocket
+        logger.info("Connected to peer at %s", uri)
 
+        async def run():
+            try:
+                await self.handle_connection(websocket)
+            finally:
+                self._outbound.pop(uri, None)
 
+        self.loop.create_task(run())
 
-    async def handle_connection(self, websocket, path):
-        """Handle incoming connections from peers."""
+    async def handle_connection(self, websocket, path=None):
+        """Serve one peer connection, inbound or outbound, until it closes."""
         self.peers.append(websocket)
         try:
+            await self._send(websocket, self._hello())
             async for message in websocket:
                 await self.handle_message(message, websocket)
         except websockets.ConnectionClosed:
+            pass
+        finally:
             self.peers.remove(websocket)
+            self.binary_peers.discard(websocket)
+            self._catchup.pop(websocket, None)
 
+    def _hello(self, reply=False):
+        return {"type": "HELLO", "encodings": ["binary"], "height": self.blockchain.chain[-1].index, "reply": reply}
+
+    async def _send(self, websocket, message):
+        started = time.perf_counter()
+        try:
+            await websocket.send(message if isinstance(message, bytes) else json.dumps(message))
+        except websockets.ConnectionClosed:
+            pass
+        SEND_SECONDS.labels(node=self.blockchain.node).observe(time.perf_counter() - started)
+
+    async def _run_blocking(self, function, *args):
+        """Run a Blockchain call off the event loop so validation does not stall other peers."""
+        return await self.loop.run_in_executor(None, function, *args)
 
     async def handle_message(self, message, websocket):
         """Handle incoming messages."""
-
         try:
+            if isinstance(message, bytes):
+                MESSAGES_RECEIVED.labels(node=self.blockchain.node, type="BINARY").inc()
+                await self.handle_binary_message(message, websocket)
+                return
             data = json.loads(message)
             msg_type = data.get('type')
-            print(f"Received message of type {msg_type}")
-            if msg_type == 'TRANSACTION':
-                await self.handle_incoming_transaction(data['transaction'], websocket)
+            MESSAGES_RECEIVED.labels(node=self.blockchain.node, type=msg_type).inc()
+            if msg_type == 'HELLO':
+                await self.handle_hello(data, websocket)
+            elif msg_type == 'INV':
+                await self.handle_inventory(data['items'], websocket)
+            elif msg_type == 'GETDATA':
+                await self.handle_getdata(data['items'], websocket)
             elif msg_type == 'BLOCK':
-                await self.handle_incoming_block(data['block'])
-            elif msg_type == 'TRANSACTION':
-                await self.handle_incoming_transaction(data['transaction'])
-            elif msg_type == 'WALLET':
-                await self.handle_incoming_wallet(data['public_key'])
-            elif msg_type == 'SYNC':
-                await self.handle_sync(data['chain'])
-            elif msg_type == 'PENDING_TRANSACTIONS':
-                await self.handle_incoming_pending_transactions(data['transactions'])
-            elif msg_type == 'REQUEST_CHAIN':
-                await self.handle_chain_request(websocket)
-            elif msg_type == 'RESPONSE_CHAIN':
-                await self.handle_chain_response(data['chain'])
-            elif msg_type == 'REQUEST_PENDING_TRANSACTIONS':
-                await self.handle_pending_transactions_request(websocket)
-            elif msg_type == 'RESPONSE_PENDING_TRANSACTIONS':
-                await self.handle_incoming_pending_transactions(data['transactions'])
+                await self.handle_incoming_block(data['block'], websocket)
+            elif msg_type == 'TX':
+                await self.handle_incoming_transaction(data['transaction'], websocket)
+            elif msg_type == 'GETBLOCKS':
+                await self.handle_getblocks(data['locator'], data.get('limit', self.batch_size), websocket)
+            elif msg_type == 'BLOCKS':
+                await self.handle_blocks(data['blocks'], websocket)
+            elif msg_type == 'MEMPOOL':
+                await self.handle_mempool_request(websocket)
         except Exception as e:
-            print(f"Error handling message: {e}")
-
-        
-
-        
-
-    async def handle_incoming_block(self, block_data):
-        block = Block.from_dict(block_data)
-        if self.blockchain.add_block(block):
-            print("Block added to the chain.")
-            # Broadcast the block to peers
-            await self.broadcast_block(block.to_dict())
+            logger.error("Error handling message: %s", e)
+
+    async def handle_binary_message(self, message, websocket):
+        msg_type = message[0]
+        blocks = decode_blocks(message[1:])
+        if msg_type == BINARY_BLOCK:
+            for block_data in blocks:
+                await self.handle_incoming_block(block_data, websocket)
+        elif msg_type == BINARY_BLOCKS:
+            await self.handle_blocks(blocks, websocket)
+
+    async def handle_hello(self, data, websocket):
+        if 'binary' in data.get('encodings', []):
+            self.binary_peers.add(websocket)
+        if not data.get('reply'):
+            await self._send(websocket, self._hello(reply=True))
+        self.blockchain.observe_peer_height(data.get('height', 0))
+        if data.get('height', 0) > self.blockchain.chain[-1].index:
+            await self.request_blocks(websocket)
+        await self._send(websocket, {"type": "MEMPOOL"})
+
+    # Inventory announcements
+
+    def announce_block(self, block):
+        """Announce a block accepted or mined locally; safe to call from any thread."""
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._announce_block(block, None), self.loop)
+
+    def announce_transaction(self, transaction):
+        self.announce_transactions([transaction])
+
+    def announce_transactions(self, transactions):
+        if self.loop is not None:
+            items = [["tx", transaction['transaction_id']] for transaction in transactions]
+            asyncio.run_coroutine_threadsafe(self._announce(items, None), self.loop)
+
+    async def _announce_block(self, block, source):
+        self._remember_block(block)
+        await self._announce([["block", block.hash]], source)
+
+    async def _announce(self, items, source):
+        for kind, key in items:
+            self.seen.add(key)
+        message = {"type": "INV", "items": items}
+        for peer in list(self.peers):
+            if peer is not source:
+                await self._send(peer, message)
+
+    def _remember_block(self, block):
+        self.seen.add(block.hash)
+        self._recent_blocks[block.hash] = block
+        while len(self._recent_blocks) > 1000:
+            self._recent_blocks.popitem(last=False)
+
+    def _have(self, kind, key):
+        if key in self.seen:
+            return True
+        if kind == "block":
+            return key in self._recent_blocks or self.blockchain.chain[-1].hash == key
+        return key in self.blockchain.mempool or key in self.blockchain.tx_index
+
+    async def handle_inventory(self, items, websocket):
+        now = time.time()
+        wanted = []
+        for kind, key in items:
+            if self._have(kind, key) or self._in_flight.get(key, 0) > now:
+                continue
+            # Ask only one peer at a time; retry elsewhere if it does not answer.
+            self._in_flight[key] = now + self.request_timeout
+            wanted.append([kind, key])
+        if len(self._in_flight) > 10000:
+            self._in_flight = {key: deadline for key, deadline in self._in_flight.items() if deadline > now}
+        if wanted:
+            await self._send(websocket, {"type": "GETDATA", "items": wanted})
+
+    async def handle_getdata(self, items, websocket):
+        for kind, key in items:
+            if kind == "block":
+                block = self._find_block(key)
+                if block is not None:
+                    await self._send_blocks(websocket, [block], single=True)
+            elif kind == "tx":
+                transaction = self.blockchain.find_transaction(key)
+                if transaction is not None:
+                    await self._send(websocket, {"type": "TX", "transaction": transaction})
+
+    def _find_block(self, block_hash):
+        block = self._recent_blocks.get(block_hash)
+        if block is None:
+            for candidate in reversed(self.blockchain.chain[-100:]):
+                if candidate.hash == block_hash:
+                    return candidate
+        return block
+
+    async def _send_blocks(self, websocket, blocks, single=False):
+        if websocket in self.binary_peers:
+            await self._send(websocket, bytes([BINARY_BLOCK if single else BINARY_BLOCKS]) + encode_blocks(blocks))
+        elif single:
+            await self._send(websocket, {"type": "BLOCK", "block": blocks[0].to_dict()})
         else:
-            print("Invalid block received. Requesting full chain sync.")
-            await self.request_full_chain()
+            await self._send(websocket, {"type": "BLOCKS", "blocks": [block.to_dict() for block in blocks]})
 
+    # Objects
 
+    async def handle_incoming_block(self, block_data, websocket):
+        block = Block.from_dict(block_data)
+        self._in_flight.pop(block.hash, None)
+        if block.hash in self.seen:
+            return
+        self.blockchain.observe_peer_height(block.index)
+        tip = self.blockchain.chain[-1]
+        if block.previous_hash == tip.hash:
+            self.seen.add(block.hash)
+            if await self._run_blocking(self.blockchain.add_block, block):
+                await self._announce_block(block, websocket)
+        elif block.index > tip.index:
+            # We are missing its parent: catch up from this peer.
+            await self.request_blocks(websocket)
 
     async def handle_incoming_transaction(self, transaction_data, websocket):
-        print(f"Received transaction: {transaction_data}")
-        if transaction_data not in self.blockchain.pending_transactions:
-            self.blockchain.pending_transactions.append(transaction_data)
-            self.blockchain.save_state()
-            print("Transaction added to the pending pool.")
-            # Broadcast the transaction to peers, excluding the sender
-            await self.broadcast_transaction(transaction_data, exclude_peers=[websocket])
+        transaction_id = transaction_data.get('transaction_id')
+        self._in_flight.pop(transaction_id, None)
+        if transaction_id is None or not self.seen.add(transaction_id):
+            return
+        if await self._run_blocking(self.blockchain.merge_mempool, [transaction_data]):
+            await self._announce([["tx", transaction_id]], websocket)
+
+    async def handle_mempool_request(self, websocket):
+        transaction_ids = list(self.blockchain.mempool)[:5000]
+        if transaction_ids:
+            await self._send(websocket, {"type": "INV", "items": [["tx", tx_id] for tx_id in transaction_ids]})
+
+    # Catching up
+
+    def block_locator(self):
+        """[index, hash] pairs from the tip back to genesis, dense first then doubling the step."""
+        chain = self.blockchain.chain
+        locator = []
+        index, step = len(chain) - 1, 1
+        while index > 0:
+            locator.append([index, chain[index].hash])
+            if len(locator) >= 10:
+                step *= 2
+            index -= step
+        locator.append([0, chain[0].hash])
+        return locator
+
+    async def request_blocks(self, websocket, locator=None):
+        await self._send(websocket, {
+            "type": "GETBLOCKS",
+            "locator": locator or self.block_locator(),
+            "limit": self.batch_size
+        })
+
+    async def handle_getblocks(self, locator, limit, websocket):
+        chain = self.blockchain.chain
+        start = None
+        for index, block_hash in locator:
+            if index < len(chain) and chain[index].hash == block_hash:
+                start = index + 1
+                break
+        limit = max(1, min(int(limit), MAX_BLOCKS_PER_BATCH))
+        blocks = await self._run_blocking(self.blockchain.get_blocks, start, start + limit - 1) if start is not None else []
+        await self._send_blocks(websocket, blocks)
+
+    async def handle_blocks(self, blocks_data, websocket):
+        """Apply a GETBLOCKS batch; fork batches are buffered until they outgrow our chain."""
+        blocks = [Block.from_dict(block_data) for block_data in blocks_data]
+        pending = self._catchup.pop(websocket, []) + blocks
+        chain = self.blockchain.chain
+        applied = []
+        if pending and pending[0].index == len(chain) and pending[0].previous_hash == chain[-1].hash:
+            for block in pending:
+                if not await self._run_blocking(self.blockchain.add_block, block):
+                    break
+                self._remember_block(block)
+                applied.append(block)
+            pending = []
+        elif pending and 0 < pending[0].index < len(chain) and chain[pending[0].index - 1].hash == pending[0].previous_hash:
+            candidate = chain[:pending[0].index] + pending
+            if len(candidate) > len(chain):
+                if await self._run_blocking(self.blockchain.replace_chain, candidate):
+                    for block in pending:
+                        self._remember_block(block)
+                    applied = pending
+                pending = []
         else:
-            print("Transaction already in pending pool.")
-
-    async def broadcast_transaction(self, transaction_data):
-        """Broadcast transaction to all connected peers."""
-        message = json.dumps({"type": "TRANSACTION", "transaction": transaction_data})
-        await self._broadcast_message(message)
-
-    async def handle_incoming_wallet(self, public_key):
-        if public_key not in self.blockchain.wallets:
-            self.blockchain.wallets[public_key] = 10
-            self.blockchain.save_state()
-            print(f"Received new wallet: {public_key}")
-            await self.broadcast_wallet(public_key)
-
-    async def broadcast_block(self, block_data):
-        """Broadcast block to all connected peers."""
-        message = json.dumps({"type": "BLOCK", "block": block_data})
-        await self._broadcast_message(message)
-
-    async def _broadcast_message(self, message, exclude_peers=None):
-        """Internal method to broadcast messages to all peers."""
-        if exclude_peers is None:
-            exclude_peers = []
-        print(f"Peers: {self.peers}")
-        for peer in self.peers:
-            if peer in exclude_peers:
-                continue
-            try:
-                await peer.send(message)
-                print(f"Message sent to peer {peer.remote_address}")
-            except Exception as e:
-                print(f"Failed to send message to peer: {e}")
-
-
-    async def broadcast_wallet(self, public_key):
-        """Broadcast wallet creation to all connected peers."""
-        message = json.dumps({"type": "WALLET", "public_key": public_key})
-        await self._broadcast_message(message)
-
-    async def _broadcast_message(self, message, exclude_peers=None):
-        """Internal method to broadcast messages to all peers."""
-        if exclude_peers is None:
-            exclude_peers = []
-        for peer in self.peers:
-            if peer in exclude_peers:
-                continue
-            try:
-                await peer.send(message)
-                print(f"Message sent to peer {peer.remote_address}")
-            except Exception as e:
-                print(f"Failed to send message to peer: {e}")
-
-
-    async def request_full_chain(self):
-        """Request the full chain from all peers."""
-        message = json.dumps({"type": "REQUEST_CHAIN"})
-        await self._broadcast_message(message)
-
-    async def request_pending_transactions(self):
-        """Request pending transactions from all peers."""
-        message = json.dumps({"type": "REQUEST_PENDING_TRANSACTIONS"})
-        await self._broadcast_message(message)
-
-    async def handle_sync(self, incoming_chain_data):
-        """Handle incoming chain sync request."""
-        incoming_chain = [self.blockchain.create_block_from_dict(block) for block in incoming_chain_data]
-        if len(incoming_chain) > len(self.blockchain.chain):
-            self.blockchain.chain = incoming_chain
-            self.blockchain.save_state()
-            print("Blockchain synchronized with peer.")
-
-    async def handle_incoming_pending_transactions(self, transactions):
-        """Handle incoming pending transactions from peers."""
-        for transaction in transactions:
-            if transaction not in self.blockchain.pending_transactions:
-                self.blockchain.pending_transactions.append(transaction)
-        self.blockchain.save_state()
-        print("Pending transactions synchronized with peer.")
-
-    def connect_to_peer(self, host, port):
-        """Connect to a new peer via WebSocket."""
-        self.loop_ready.wait()  # Wait until the event loop is ready
-
-        async def connect():
-            try:
-                uri = f"ws://{host}:{port}"
-                websocket = await websockets.connect(uri)
-                self.peers.append(websocket)
-                print(f"Connected to peer at {host}:{port}")
-                await self.request_full_chain()
-                await self.request_pending_transactions()
-            except Exception as e:
-                print(f"Failed to connect to peer at {host}:{port}: {e}")
-
-        # Schedule the coroutine in the P2P network's event loop
-        asyncio.run_coroutine_threadsafe(connect(), self.loop)
-
-
-
+            pending = []
+        if applied:
+            # Let our other peers know about the new tip; they catch up from us.
+            await self._announce([["block", applied[-1].hash]], websocket)
+        if len(blocks) >= self.batch_size:
+            # The peer has more; continue right after the last block it sent.
+            self._catchup[websocket] = pending
+            await self.request_blocks(websocket, [[blocks[-1].index, blocks[-1].hash]])
 
     def get_connected_peers(self):
-     return [f"{peer.remote_address[0]}:{peer.remote_address[1]}" for peer in self.peers if peer.open]
-
-
-
-    async def handle_chain_request(self, websocket):
-        chain_data = [block.to_dict() for block in self.blockchain.chain]
-        message = json.dumps({'type': 'RESPONSE_CHAIN', 'chain': chain_data})
-        await websocket.send(message)
-
-    async def handle_chain_response(self, chain_data):
-        incoming_chain = [self.blockchain.create_block_from_dict(block_data) for block_data in chain_data]
-        if len(incoming_chain) > len(self.blockchain.chain) and self.blockchain.is_valid_chain(incoming_chain):
-            self.blockchain.replace_chain(incoming_chain)
-            print("Blockchain synchronized with peer.")
-
-    async def handle_pending_transactions_request(self, websocket):
-        """Send pending transactions to the requesting peer."""
-        message = json.dumps({'type': 'RESPONSE_PENDING_TRANSACTIONS', 'transactions': self.blockchain.pending_transactions})
-        await websocket.send(message)
\ No newline at end of file
+        return [f"{peer.remote_address[0]}:{peer.remote_address[1]}" for peer in self.peers]
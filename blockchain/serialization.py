@@ -0,0 +1,310 @@
+import base64
+import json
+import struct
+
+# Content type used when a peer asks for blocks in the binary encoding.
+BINARY_MIMETYPE = "application/vnd.gcit.blocks"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+FORMAT_VERSION = 1
+
+# Value tags. Keys, signatures, uuids and hashes are stored raw when their
+# text form can be reproduced exactly; anything else falls back to a string.
+T_NONE = 0
+T_STR = 1
+T_INT = 2
+T_FLOAT = 3
+T_TRUE = 4
+T_FALSE = 5
+T_KEY = 6
+T_SIGNATURE = 7
+T_UUID = 8
+T_HASH = 9
+T_JSON = 10
+
+KEY_SIZE = 33
+SIGNATURE_SIZE = 64
+
+TRANSACTION_FIELDS = ("sender", "recipient", "amount", "signature", "timestamp", "transaction_id")
+
+_U8 = struct.Struct(">B")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_F64 = struct.Struct(">d")
+
+
+def _b64decode_exact(text, size):
+    """Raw bytes for an unpadded urlsafe base64 string, only if re-encoding gives the same text."""
+    try:
+        raw = base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+    except (ValueError, TypeError):
+        return None
+    if len(raw) != size or base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=') != text:
+        return None
+    return raw
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _uuid_text(raw):
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def _uuid_bytes(text):
+    """16 raw bytes for a canonical (lowercase, hyphenated) uuid string, else None."""
+    if not isinstance(text, str) or len(text) != 36:
+        return None
+    try:
+        raw = bytes.fromhex(text.replace('-', ''))
+    except ValueError:
+        return None
+    return raw if len(raw) == 16 and _uuid_text(raw) == text else None
+
+
+def _hash_bytes(text):
+    if not isinstance(text, str) or len(text) != 64:
+        return None
+    try:
+        raw = bytes.fromhex(text)
+    except ValueError:
+        return None
+    return raw if raw.hex() == text else None
+
+
+def _signature_bytes(text):
+    """64 signature bytes + 16 uuid bytes for the "<base64>(<uuid>)" form Crypto produces."""
+    if not isinstance(text, str) or not text.endswith(')') or '(' not in text:
+        return None
+    encoded, uuid_text = text[:-1].rsplit('(', 1)
+    raw = _b64decode_exact(encoded, SIGNATURE_SIZE)
+    uuid_raw = _uuid_bytes(uuid_text)
+    if raw is None or uuid_raw is None:
+        return None
+    return raw + uuid_raw
+
+
+def _write_value(out, value, hint=None):
+    if value is None:
+        out += _U8.pack(T_NONE)
+    elif value is True:
+        out += _U8.pack(T_TRUE)
+    elif value is False:
+        out += _U8.pack(T_FALSE)
+    elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+        out += _U8.pack(T_INT) + _I64.pack(value)
+    elif isinstance(value, float):
+        out += _U8.pack(T_FLOAT) + _F64.pack(value)
+    elif isinstance(value, str):
+        raw = None
+        if hint == T_KEY:
+            raw = _b64decode_exact(value, KEY_SIZE)
+        elif hint == T_SIGNATURE:
+            raw = _signature_bytes(value)
+        elif hint == T_UUID:
+            raw = _uuid_bytes(value)
+        elif hint == T_HASH:
+            raw = _hash_bytes(value)
+        if raw is not None:
+            out += _U8.pack(hint) + raw
+        else:
+            encoded = value.encode('utf-8')
+            out += _U8.pack(T_STR) + _U32.pack(len(encoded)) + encoded
+    else:
+        encoded = json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        out += _U8.pack(T_JSON) + _U32.pack(len(encoded)) + encoded
+
+
+def _read_value(data, offset):
+    tag = data[offset]
+    offset += 1
+    if tag == T_NONE:
+        return None, offset
+    if tag == T_TRUE:
+        return True, offset
+    if tag == T_FALSE:
+        return False, offset
+    if tag == T_INT:
+        return _I64.unpack_from(data, offset)[0], offset + 8
+    if tag == T_FLOAT:
+        return _F64.unpack_from(data, offset)[0], offset + 8
+    if tag == T_KEY:
+        return _b64encode(data[offset:offset + KEY_SIZE]), offset + KEY_SIZE
+    if tag == T_SIGNATURE:
+        end = offset + SIGNATURE_SIZE
+        signature = _b64encode(data[offset:end])
+        return f"{signature}({_uuid_text(bytes(data[end:end + 16]))})", end + 16
+    if tag == T_UUID:
+        return _uuid_text(bytes(data[offset:offset + 16])), offset + 16
+    if tag == T_HASH:
+        return bytes(data[offset:offset + 32]).hex(), offset + 32
+    if tag in (T_STR, T_JSON):
+        length = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        text = bytes(data[offset:offset + length]).decode('utf-8')
+        return (text if tag == T_STR else json.loads(text)), offset + length
+    raise ValueError(f"Unknown value tag {tag}")
+
+
+_TRANSACTION_HINTS = {
+    "sender": T_KEY,
+    "recipient": T_KEY,
+    "signature": T_SIGNATURE,
+    "transaction_id": T_UUID
+}
+
+
+def encode_transaction(transaction):
+    """Binary form of a transaction dict.
+
+    A presence bitmask covers the known fields, which follow in a fixed order;
+    any other keys are appended sorted by name so the encoding is canonical.
+    """
+    out = bytearray()
+    mask = 0
+    for bit, field in enumerate(TRANSACTION_FIELDS):
+        if field in transaction:
+            mask |= 1 << bit
+    out += _U8.pack(mask)
+    for field in TRANSACTION_FIELDS:
+        if field in transaction:
+            _write_value(out, transaction[field], _TRANSACTION_HINTS.get(field))
+    extra = sorted(key for key in transaction if key not in TRANSACTION_FIELDS)
+    out += _U16.pack(len(extra))
+    for key in extra:
+        _write_value(out, key)
+        _write_value(out, transaction[key])
+    return bytes(out)
+
+
+def _read_transaction(data, offset):
+    """Decode one transaction: known fields first, in TRANSACTION_FIELDS order, then any extras."""
+    mask = data[offset]
+    offset += 1
+    present = {}
+    for bit, field in enumerate(TRANSACTION_FIELDS):
+        if mask & (1 << bit):
+            present[field], offset = _read_value(data, offset)
+    extra_count = _U16.unpack_from(data, offset)[0]
+    offset += 2
+    for _ in range(extra_count):
+        key, offset = _read_value(data, offset)
+        present[key], offset = _read_value(data, offset)
+    return present, offset
+
+
+def decode_transaction(data):
+    transaction, _ = _read_transaction(memoryview(data), 0)
+    return transaction
+
+
+def encode_block(block, include_transactions=True):
+    """Binary form of a Block; with include_transactions=False only the header is written."""
+    out = bytearray(_U8.pack(FORMAT_VERSION))
+    out += _I64.pack(block.index)
+    _write_value(out, block.timestamp)
+    _write_value(out, block.previous_hash, T_HASH)
+    _write_value(out, block.nonce)
+    _write_value(out, block.merkle_root, T_HASH)
+    _write_value(out, block.hash, T_HASH)
+    transactions = block.transactions if include_transactions else []
+    out += _U32.pack(len(transactions))
+    for tx in transactions:
+        encoded = encode_transaction(tx)
+        out += _U32.pack(len(encoded)) + encoded
+    return bytes(out)
+
+
+def _read_block(data, offset):
+    version = data[offset]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported block encoding version {version}")
+    index = _I64.unpack_from(data, offset + 1)[0]
+    offset += 9
+    timestamp, offset = _read_value(data, offset)
+    previous_hash, offset = _read_value(data, offset)
+    nonce, offset = _read_value(data, offset)
+    merkle_root, offset = _read_value(data, offset)
+    block_hash, offset = _read_value(data, offset)
+    count = _U32.unpack_from(data, offset)[0]
+    offset += 4
+    transactions = []
+    for _ in range(count):
+        length = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        tx, _ = _read_transaction(data, offset)
+        transactions.append(tx)
+        offset += length
+    block_data = {
+        "index": index,
+        "transactions": transactions,
+        "timestamp": timestamp,
+        "previous_hash": previous_hash,
+        "nonce": nonce,
+        "merkle_root": merkle_root,
+        "hash": block_hash
+    }
+    return block_data, offset
+
+
+def decode_block(data):
+    """Decode one block into the same dict shape as Block.to_dict()."""
+    block_data, _ = _read_block(memoryview(data), 0)
+    return block_data
+
+
+def encode_blocks(blocks, include_transactions=True):
+    out = bytearray(_U32.pack(len(blocks)))
+    for block in blocks:
+        encoded = encode_block(block, include_transactions)
+        out += _U32.pack(len(encoded)) + encoded
+    return bytes(out)
+
+
+def decode_blocks(data):
+    """Decode an encode_blocks() payload into a list of block dicts."""
+    data = memoryview(data)
+    count = _U32.unpack_from(data, 0)[0]
+    offset = 4
+    blocks = []
+    for _ in range(count):
+        length = _U32.unpack_from(data, offset)[0]
+        offset += 4
+        block_data, _ = _read_block(data, offset)
+        blocks.append(block_data)
+        offset += length
+    return blocks
+
+
+def iter_encode_blocks(blocks, include_transactions=True):
+    """encode_blocks() output produced one block at a time, for streaming responses."""
+    yield _U32.pack(len(blocks))
+    for block in blocks:
+        encoded = encode_block(block, include_transactions)
+        yield _U32.pack(len(encoded)) + encoded
+
+
+def iter_decode_blocks(chunks):
+    """Decode an encode_blocks() payload arriving as arbitrary byte chunks, yielding block dicts."""
+    buffer = bytearray()
+    remaining = None
+    for chunk in chunks:
+        buffer += chunk
+        if remaining is None:
+            if len(buffer) < 4:
+                continue
+            remaining = _U32.unpack_from(buffer, 0)[0]
+            del buffer[:4]
+        while remaining and len(buffer) >= 4:
+            length = _U32.unpack_from(buffer, 0)[0]
+            if len(buffer) < 4 + length:
+                break
+            block_data, _ = _read_block(memoryview(bytes(buffer[4:4 + length])), 0)
+            del buffer[:4 + length]
+            remaining -= 1
+            yield block_data
+    if remaining:
+        raise ValueError(f"Block stream ended with {remaining} blocks missing")
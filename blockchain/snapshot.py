@@ -0,0 +1,34 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+
+def save_snapshot(path, snapshot):
+    """Write a snapshot file atomically, so a crash mid-write leaves the previous one intact."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(dict(snapshot, version=SNAPSHOT_VERSION), f, separators=(',', ':'))
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path):
+    """The snapshot stored at path, or None if there is no usable one."""
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        logger.warning("Ignoring snapshot %s with unsupported version %s", path, snapshot.get('version'))
+        return None
+    return snapshot
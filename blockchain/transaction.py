@@ -1,3 +1,6 @@
+from blockchain.serialization import decode_transaction, encode_transaction
+
+
 class Transaction:
     def __init__(self, sender, recipient, amount, signature, timestamp=None, transaction_id=None):
         self.sender = sender
@@ -20,6 +23,13 @@ class Transaction:
             transaction_dict["transaction_id"] = self.transaction_id 
         return transaction_dict
 
+    def to_bytes(self):
+        return encode_transaction(self.to_dict())
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.from_dict(decode_transaction(data))
+
     @classmethod
     def from_dict(cls, data):
         return cls(
@@ -0,0 +1,173 @@
+import logging
+import time
+from blockchain.merkle_tree import MerkleTree
+from monitoring import metrics
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_SECONDS = metrics.histogram("blockchain_block_validation_seconds", "Time to validate a block.", ["node"])
+STAGE_SECONDS = metrics.histogram("blockchain_block_validation_stage_seconds",
+                                  "Time spent in each block validation stage.", ["node", "stage"])
+VALIDATION_FAILURES = metrics.counter("blockchain_block_validation_failures_total",
+                                      "Blocks rejected, by the validation stage that failed.", ["node", "stage"])
+
+
+def check_amount(tx):
+    """An error string if the transaction's amount is not a positive number, else None."""
+    amount = tx['amount']
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount <= 0:
+        return f"invalid amount in transaction {tx.get('transaction_id')}"
+    return None
+
+
+def check_identifiers(tx):
+    """An error string if the transaction's id or signature is not a string, else None."""
+    for field in ('transaction_id', 'signature'):
+        if not isinstance(tx.get(field), str):
+            return f"invalid {field} in transaction"
+    return None
+
+
+def apply_transfer(tx, balances, changes):
+    """Apply one transfer on top of `balances` + `changes`; returns an error string or None.
+
+    `changes` receives the new balances of the sender and recipient, so `balances`
+    itself is never written.
+    """
+    sender = tx['sender']
+    recipient = tx['recipient']
+    amount = tx['amount']
+    error = check_amount(tx)
+    if error:
+        return error
+    if sender == "ICO":
+        return "ICO transaction outside the genesis block"
+    available = changes.get(sender, balances.get(sender, 0))
+    if available < amount:
+        return f"insufficient funds for transaction {tx.get('transaction_id')}"
+    changes[sender] = available - amount
+    changes[recipient] = changes.get(recipient, balances.get(recipient, 0)) + amount
+    return None
+
+
+class BlockValidator:
+    """Full validation of a block: header, Merkle root, replays, balances and signatures.
+
+    Stages run cheapest first and stop at the first failure, so signatures, by
+    far the most expensive stage, are only checked for blocks that pass everything
+    else. Signature checks are fanned out through the SignatureVerifier. The time
+    spent in each stage is recorded for the last block and accumulated in stats().
+    """
+
+    STAGES = ("header", "merkle", "replays", "balances", "signatures")
+
+    def __init__(self, verifier, difficulty=4, node=""):
+        self.verifier = verifier
+        self.difficulty = difficulty
+        self.node = node
+        self.last_timings = {}
+        self.last_error = None
+        self._totals = {stage: [0, 0.0] for stage in self.STAGES}
+
+    def validate(self, block, previous_hash, balances, apply=False, confirmed=None, fork_height=None, seen=None):
+        """Validate `block` on top of `previous_hash` against the `balances` view.
+
+        A transaction is a replay if its id or signature is repeated within the
+        block, was confirmed in `confirmed` (a TransactionIndex) below
+        `fork_height` (default: the block's own index), or is in `seen`, the
+        (ids, signatures) sets of the blocks validated before this one.
+
+        With apply=True the block's balance changes are written into `balances`
+        and its ids and signatures into `seen`, which lets a caller validate a
+        run of blocks against one evolving view.
+        """
+        self.last_timings = {}
+        self.last_error = None
+        changes = {}
+        new_ids, new_signatures = set(), set()
+        block_started = time.perf_counter()
+        for stage in self.STAGES:
+            started = time.perf_counter()
+            if stage == "header":
+                ok = self._check_header(block, previous_hash)
+            elif stage == "merkle":
+                ok = self._check_merkle_root(block)
+            elif stage == "replays":
+                ok = self._check_replays(block, confirmed, fork_height, seen, new_ids, new_signatures)
+            elif stage == "balances":
+                ok = self._check_balances(block, balances, changes)
+            else:
+                ok = self.verifier.verify_all_transactions(block.transactions)
+                if not ok:
+                    self.last_error = "invalid signature"
+            elapsed = time.perf_counter() - started
+            self.last_timings[stage] = elapsed
+            self._totals[stage][0] += 1
+            self._totals[stage][1] += elapsed
+            STAGE_SECONDS.labels(node=self.node, stage=stage).observe(elapsed)
+            if not ok:
+                VALIDATION_FAILURES.labels(node=self.node, stage=stage).inc()
+                VALIDATION_SECONDS.labels(node=self.node).observe(time.perf_counter() - block_started)
+                logger.warning("Block %s failed %s validation: %s", block.index, stage, self.last_error)
+                return False
+        if apply:
+            balances.update(changes)
+            if seen is not None:
+                seen[0].update(new_ids)
+                seen[1].update(new_signatures)
+        VALIDATION_SECONDS.labels(node=self.node).observe(time.perf_counter() - block_started)
+        return True
+
+    def _check_header(self, block, previous_hash):
+        if block.previous_hash != previous_hash:
+            self.last_error = "previous hash mismatch"
+            return False
+        if not block.hash.startswith('0' * self.difficulty):
+            self.last_error = "insufficient proof of work"
+            return False
+        return True
+
+    def _check_merkle_root(self, block):
+        if MerkleTree(block.transactions).root != block.merkle_root:
+            self.last_error = "merkle root mismatch"
+            return False
+        return True
+
+    def _check_replays(self, block, confirmed, fork_height, seen, ids, signatures):
+        fork_height = block.index if fork_height is None else fork_height
+        seen_ids, seen_signatures = seen if seen is not None else ((), ())
+        for tx in block.transactions:
+            self.last_error = check_identifiers(tx)
+            if self.last_error:
+                return False
+            transaction_id, signature = tx['transaction_id'], tx['signature']
+            replayed = transaction_id in ids or transaction_id in seen_ids \
+                or signature in signatures or signature in seen_signatures
+            if not replayed and confirmed is not None:
+                location = confirmed.get(transaction_id)
+                signature_height = confirmed.signature_height(signature)
+                replayed = (location is not None and location[0] < fork_height) or \
+                    (signature_height is not None and signature_height < fork_height)
+            if replayed:
+                self.last_error = f"replayed transaction {transaction_id}"
+                return False
+            ids.add(transaction_id)
+            signatures.add(signature)
+        return True
+
+    def _check_balances(self, block, balances, changes):
+        for tx in block.transactions:
+            self.last_error = apply_transfer(tx, balances, changes)
+            if self.last_error:
+                return False
+        return True
+
+    def stats(self):
+        return {
+            stage: {
+                "blocks": count,
+                "total_seconds": total,
+                "last_seconds": self.last_timings.get(stage)
+            }
+            for stage, (count, total) in self._totals.items()
+        }
@@ -1,15 +1,18 @@
+import logging
 from cryptolib.crypto import Crypto
 from blockchain.transaction import Transaction
 
+logger = logging.getLogger(__name__)
+
 
 class Wallet:
     def __init__(self, blockchain):
         self.private_key, self.public_key = Crypto.generate_keypair()
         try:
             blockchain.create_wallet_transaction(self.public_key, 10)
-            print(f"Wallet created with public key: {self.public_key}")
+            logger.debug("Wallet created with public key: %s", self.public_key)
         except Exception as e:
-            print(f"Error creating wallet transaction: {e}")
+            logger.error("Error creating wallet transaction: %s", e)
 
     def export_keys(self):
         return {
@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class ChainView:
+    """Read-only snapshot of chain, balances and mempool as of the last finished write batch.
+
+    Published by the writer and never mutated afterwards, so request threads can
+    read it without locks: `wallets` and `pending` are copies taken only when
+    they changed, and `chain` is the live list bounded by `height` (the writer
+    only appends to it in place; a reorg swaps in a new list).
+    """
+
+    __slots__ = ('chain', 'height', 'wallets', 'pending', 'version')
+
+    def __init__(self, chain, wallets, pending, version=0):
+        self.chain = chain
+        self.height = len(chain) - 1
+        self.wallets = wallets
+        self.pending = pending
+        self.version = version
+
+    @property
+    def tip(self):
+        return self.chain[self.height]
+
+    def blocks(self, start, end):
+        return self.chain[start:min(end, self.height) + 1]
+
+
+class CommandLoop:
+    """Runs state-changing calls one at a time on a single writer thread.
+
+    submit() queues a call and waits for its result (exceptions are re-raised in
+    the caller); a call made from the writer thread itself runs inline. The loop
+    takes every queued command at once and calls `on_batch` after the batch, before
+    any caller is released, so a caller always reads its own write in the next
+    published view, and a burst of writes publishes only one.
+    """
+
+    def __init__(self, on_batch=None, max_batch=256, name="blockchain-writer"):
+        self.on_batch = on_batch
+        self.max_batch = max_batch
+        self.name = name
+        self.commands = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def in_writer(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        if self.in_writer():
+            return function(*args, **kwargs)
+        self.start()
+        future = Future()
+        self._queue.put((function, args, kwargs, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            outcomes = []
+            for function, args, kwargs, future in batch:
+                try:
+                    outcomes.append((future, function(*args, **kwargs), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            self.commands += len(batch)
+            self.batches += 1
+            if self.on_batch:
+                try:
+                    self.on_batch()
+                except Exception as e:
+                    logger.error("Error publishing state after a write batch: %s", e)
+            for future, result, error in outcomes:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "commands": self.commands,
+            "batches": self.batches,
+            "queued": self._queue.qsize()
+        }
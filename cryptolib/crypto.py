@@ -1,6 +1,7 @@
 import base64
 from ecdsa import SigningKey, VerifyingKey, SECP256k1, BadSignatureError
 import hashlib
+from functools import lru_cache
 import uuid
 
 
@@ -32,7 +33,6 @@ class Crypto:
     @staticmethod
     def verify_signature(public_key, message, signature_with_uuid):
         try:
-            print(f"Verifying signature: public_key={public_key}, message={message}, signature_with_uuid={signature_with_uuid}")
             if '(' in signature_with_uuid and signature_with_uuid.endswith(')'):
                 signature_encoded, uuid_str = signature_with_uuid.rsplit('(', 1)
                 uuid_str = uuid_str[:-1]
@@ -40,21 +40,23 @@ class Crypto:
                 raise ValueError("Invalid signature format. UUID not found.")
 
             message_with_uuid = message + uuid_str
-
-            padding_pk = '=' * (-len(public_key) % 4)
-            verifying_key_bytes = base64.urlsafe_b64decode(public_key.encode('utf-8') + padding_pk.encode('utf-8'))
-            verifying_key = VerifyingKey.from_string(verifying_key_bytes, curve=SECP256k1)
+            verifying_key = Crypto.load_verifying_key(public_key)
 
             padding_sig = '=' * (-len(signature_encoded) % 4)
             signature_bytes = base64.urlsafe_b64decode(signature_encoded.encode('utf-8') + padding_sig.encode('utf-8'))
 
-            is_valid = verifying_key.verify(signature_bytes, message_with_uuid.encode('utf-8'))
-            print(f"Signature valid: {is_valid}")
-            return is_valid
-        except (BadSignatureError, Exception) as e:
-            print(f"Signature verification error: {e}")
+            return verifying_key.verify(signature_bytes, message_with_uuid.encode('utf-8'))
+        except (BadSignatureError, Exception):
             return False
 
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def load_verifying_key(public_key):
+        """Parse a base64 public key once; repeat senders hit the LRU cache."""
+        padding_pk = '=' * (-len(public_key) % 4)
+        verifying_key_bytes = base64.urlsafe_b64decode(public_key.encode('utf-8') + padding_pk.encode('utf-8'))
+        return VerifyingKey.from_string(verifying_key_bytes, curve=SECP256k1)
+
     @staticmethod
     def hash(data):
         return hashlib.sha256(data.encode('utf-8')).hexdigest()
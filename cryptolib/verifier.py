@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from cryptolib.crypto import Crypto
+from monitoring import metrics
+
+VERIFICATIONS = metrics.counter("blockchain_signature_verifications_total",
+                                "Signatures submitted for verification (verify_all may stop early).", ["node"])
+VERIFICATION_SECONDS = metrics.histogram("blockchain_signature_verification_seconds",
+                                         "Time per verify call, single signature or batch.", ["node"])
+
+
+def _verify_chunk(items):
+    return [Crypto.verify_signature(public_key, message, signature) for public_key, message, signature in items]
+
+
+def _verify_all_chunk(items):
+    return all(Crypto.verify_signature(public_key, message, signature) for public_key, message, signature in items)
+
+
+def _transaction_items(transactions):
+    return [
+        (tx['sender'], f"{tx['sender']}{tx['recipient']}{tx['amount']}", tx['signature'])
+        for tx in transactions
+    ]
+
+
+class SignatureVerifier:
+    """Verifies batches of (public_key, message, signature) tuples on a process pool.
+
+    Each worker keeps its own LRU cache of parsed verifying keys (see
+    Crypto.load_verifying_key). Batches smaller than `min_pool_batch`, and every
+    batch when `workers` is 0, are verified inline because pickling them to a
+    worker would cost more than the verification. Nodes sharing one verifier
+    each use a for_node() view, so their metrics stay apart but the pool does not.
+    """
+
+    def __init__(self, workers=None, min_pool_batch=16, node=""):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.min_pool_batch = min_pool_batch
+        self.node = node
+        self._executor = None
+        self._owner = None
+
+    def for_node(self, node):
+        """A verifier that records its metrics under `node` and uses this one's process pool."""
+        verifier = SignatureVerifier(self.workers, self.min_pool_batch, node)
+        verifier._owner = self._owner or self
+        return verifier
+
+    def _get_executor(self):
+        if self._owner is not None:
+            return self._owner._get_executor()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def verify(self, public_key, message, signature):
+        started = time.perf_counter()
+        result = Crypto.verify_signature(public_key, message, signature)
+        self._record(1, started)
+        return result
+
+    def _record(self, count, started):
+        VERIFICATIONS.labels(node=self.node).inc(count)
+        VERIFICATION_SECONDS.labels(node=self.node).observe(time.perf_counter() - started)
+
+    def verify_batch(self, items):
+        """Return one bool per item, in order."""
+        started = time.perf_counter()
+        items = list(items)
+        try:
+            return self._verify_batch(items)
+        finally:
+            self._record(len(items), started)
+
+    def _verify_batch(self, items):
+        if not self.workers or len(items) < self.min_pool_batch:
+            return _verify_chunk(items)
+        chunk_size = -(-len(items) // self.workers)
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        results = []
+        for chunk_results in self._get_executor().map(_verify_chunk, chunks):
+            results.extend(chunk_results)
+        return results
+
+    def verify_all(self, items):
+        """True only if every signature is valid; stops at the first failure.
+
+        Work is split into several chunks per worker so a bad signature found
+        early lets the chunks that have not started yet be cancelled.
+        """
+        started = time.perf_counter()
+        items = list(items)
+        try:
+            return self._verify_all(items)
+        finally:
+            self._record(len(items), started)
+
+    def _verify_all(self, items):
+        if not self.workers or len(items) < self.min_pool_batch:
+            return _verify_all_chunk(items)
+        chunk_size = -(-len(items) // (self.workers * 4))
+        executor = self._get_executor()
+        futures = [executor.submit(_verify_all_chunk, items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+        for future in as_completed(futures):
+            if not future.result():
+                for pending in futures:
+                    pending.cancel()
+                return False
+        return True
+
+    def verify_transactions(self, transactions):
+        return self.verify_batch(_transaction_items(transactions))
+
+    def verify_all_transactions(self, transactions):
+        return self.verify_all(_transaction_items(transactions))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,162 @@
+import json
+import threading
+import uuid
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class FakeCouchDB:
+    """In-memory server for the subset of the CouchDB HTTP API that CouchDBHandler uses.
+
+    Meant for tests and benchmarks that should not need a real CouchDB:
+    databases, document GET/HEAD/PUT/DELETE with revision checks, _bulk_docs,
+    and _all_docs by key range or by keys. `requests` counts the HTTP round
+    trips served, which makes I/O patterns easy to compare.
+
+        server = FakeCouchDB().start()
+        handler = CouchDBHandler("test", url=server.url)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.url = None
+        self.requests = 0
+        self.databases = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self.app = self._create_app()
+
+    def start(self):
+        self._server = make_server(self.host, self.port, self.app, threaded=True,
+                                   request_handler=_QuietRequestHandler)
+        self.port = self._server.server_port
+        self.url = f"http://{self.host}:{self.port}/"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    @staticmethod
+    def _new_rev(doc):
+        generation = int(doc["_rev"].split('-')[0]) if doc and "_rev" in doc else 0
+        return f"{generation + 1}-{uuid.uuid4().hex}"
+
+    def _write(self, db, doc):
+        """Store one doc if its _rev matches; returns (status, result) like CouchDB."""
+        doc_id = doc.get("_id") or uuid.uuid4().hex
+        existing = db.get(doc_id)
+        if (existing and doc.get("_rev") != existing["_rev"]) or (not existing and doc.get("_rev") and not doc.get("_deleted")):
+            return 409, {"id": doc_id, "error": "conflict", "reason": "Document update conflict."}
+        rev = self._new_rev(existing)
+        if doc.get("_deleted"):
+            db.pop(doc_id, None)
+        else:
+            db[doc_id] = {**doc, "_id": doc_id, "_rev": rev}
+        return 201, {"ok": True, "id": doc_id, "rev": rev}
+
+    def _create_app(self):
+        app = Flask(__name__)
+
+        @app.before_request
+        def count_request():
+            with self._lock:
+                self.requests += 1
+
+        def missing():
+            return jsonify({"error": "not_found", "reason": "missing"}), 404
+
+        @app.route('/', methods=['GET'])
+        def welcome():
+            return jsonify({"couchdb": "Welcome", "version": "fake"})
+
+        @app.route('/<db_name>', methods=['GET', 'HEAD', 'PUT', 'DELETE'])
+        def database(db_name):
+            with self._lock:
+                if request.method == 'PUT':
+                    if db_name in self.databases:
+                        return jsonify({"error": "file_exists"}), 412
+                    self.databases[db_name] = {}
+                    return jsonify({"ok": True}), 201
+                if db_name not in self.databases:
+                    return missing()
+                if request.method == 'DELETE':
+                    del self.databases[db_name]
+                    return jsonify({"ok": True}), 200
+                return jsonify({"db_name": db_name, "doc_count": len(self.databases[db_name])})
+
+        @app.route('/<db_name>/_bulk_docs', methods=['POST'])
+        def bulk_docs(db_name):
+            with self._lock:
+                db = self.databases.get(db_name)
+                if db is None:
+                    return missing()
+                return jsonify([self._write(db, doc)[1] for doc in request.json["docs"]]), 201
+
+        @app.route('/<db_name>/_all_docs', methods=['GET', 'POST'])
+        def all_docs(db_name):
+            include_docs = request.args.get('include_docs') == 'true'
+            with self._lock:
+                db = self.databases.get(db_name)
+                if db is None:
+                    return missing()
+                if request.method == 'POST':
+                    rows = []
+                    for key in request.json["keys"]:
+                        doc = db.get(key)
+                        if doc is None:
+                            rows.append({"key": key, "error": "not_found"})
+                        else:
+                            row = {"id": key, "key": key, "value": {"rev": doc["_rev"]}}
+                            if include_docs:
+                                row["doc"] = dict(doc)
+                            rows.append(row)
+                    return jsonify({"total_rows": len(db), "rows": rows})
+                startkey = json.loads(request.args.get('startkey', 'null'))
+                endkey = json.loads(request.args.get('endkey', 'null'))
+                inclusive_end = request.args.get('inclusive_end', 'true') == 'true'
+                skip = int(request.args.get('skip', 0))
+                limit = int(request.args.get('limit', len(db) + 1))
+                keys = sorted(
+                    key for key in db
+                    if (startkey is None or key >= startkey)
+                    and (endkey is None or key < endkey or (inclusive_end and key == endkey))
+                )[skip:skip + limit]
+                rows = []
+                for key in keys:
+                    row = {"id": key, "key": key, "value": {"rev": db[key]["_rev"]}}
+                    if include_docs:
+                        row["doc"] = dict(db[key])
+                    rows.append(row)
+                return jsonify({"total_rows": len(db), "offset": skip, "rows": rows})
+
+        @app.route('/<db_name>/<path:doc_id>', methods=['GET', 'HEAD', 'PUT', 'DELETE'])
+        def document(db_name, doc_id):
+            with self._lock:
+                db = self.databases.get(db_name)
+                if db is None:
+                    return missing()
+                doc = db.get(doc_id)
+                if request.method in ('GET', 'HEAD'):
+                    if doc is None:
+                        return missing()
+                    response = jsonify(doc)
+                    response.headers['ETag'] = f'"{doc["_rev"]}"'
+                    return response
+                if request.method == 'DELETE':
+                    if doc is None:
+                        return missing()
+                    status, result = self._write(db, {"_id": doc_id, "_rev": request.args.get('rev'), "_deleted": True})
+                    return jsonify(result), 200 if status == 201 else status
+                status, result = self._write(db, {**request.json, "_id": doc_id})
+                return jsonify(result), status
+
+        return app
@@ -0,0 +1,93 @@
+import json
+import threading
+from blockchain.block import Block
+from database.storage import BYTES_WRITTEN, Storage
+
+
+class MemoryStorage(Storage):
+    """In-process storage that keeps every record as a JSON string in dicts.
+
+    Nothing survives the process, but documents are serialized on write and
+    parsed on read like in the real backends, so it measures the engine's
+    persistence cost without any I/O. Meant for benchmarks and throwaway nodes.
+    """
+
+    def __init__(self, name="memory"):
+        self.name = name
+        self.blocks = {}
+        self.deltas = {}
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def _dump(self, data):
+        text = json.dumps(data)
+        BYTES_WRITTEN.labels(node=self.name, backend="memory").inc(len(text))
+        return text
+
+    def _save_doc(self, doc_id, data):
+        text = self._dump(data)
+        with self._lock:
+            self.documents[doc_id] = text
+
+    def _get_doc(self, doc_id):
+        text = self.documents.get(doc_id)
+        return json.loads(text) if text is not None else None
+
+    def save_block(self, block, overwrite=False):
+        text = self._dump(block.to_dict())
+        with self._lock:
+            if overwrite or block.index not in self.blocks:
+                self.blocks[block.index] = text
+
+    def save_blocks(self, blocks):
+        texts = [(block.index, self._dump(block.to_dict())) for block in blocks]
+        with self._lock:
+            self.blocks.update(texts)
+
+    def load_blocks(self, start=0, end=None):
+        blocks = []
+        index = start
+        while (end is None or index <= end) and index in self.blocks:
+            blocks.append(Block.from_dict(json.loads(self.blocks[index])))
+            index += 1
+        return blocks
+
+    def save_checkpoint(self, checkpoint):
+        self._save_doc("checkpoint", checkpoint)
+
+    def load_checkpoint(self):
+        return self._get_doc("checkpoint")
+
+    def save_tip(self, tip):
+        self._save_doc("chain_tip", tip)
+
+    def load_tip(self):
+        return self._get_doc("chain_tip")
+
+    def append_delta(self, seq, delta):
+        text = self._dump(delta)
+        with self._lock:
+            self.deltas[seq] = text
+
+    def load_deltas(self, start_seq=0):
+        deltas = []
+        seq = start_seq
+        while seq in self.deltas:
+            deltas.append(json.loads(self.deltas[seq]))
+            seq += 1
+        return deltas
+
+    def prune_deltas(self, before_seq):
+        with self._lock:
+            for seq in [seq for seq in self.deltas if seq < before_seq]:
+                del self.deltas[seq]
+
+    def save_blockchain_state(self, blockchain_state):
+        self._save_doc("blockchain_state", blockchain_state)
+
+    def load_blockchain_state(self):
+        return self._get_doc("blockchain_state")
+
+    def delete_blockchain_state(self):
+        with self._lock:
+            self.documents.pop("blockchain_state", None)
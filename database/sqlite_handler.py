@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from blockchain.block import Block
+from database.storage import BYTES_WRITTEN, Storage
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteHandler(Storage):
+    """Embedded file-backed storage on the standard library's sqlite3.
+
+    The database runs in WAL mode with synchronous=NORMAL, so a write is an
+    append to the log rather than a rewrite of the main file, and nodes need no
+    external database service. Blocks and deltas live in tables keyed by
+    height and sequence number, so ranges are read with one indexed query;
+    checkpoint, chain tip and state are rows of a small documents table. One
+    connection is shared by all threads behind a lock.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blocks (height INTEGER PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS deltas (seq INTEGER PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+    """
+
+    def __init__(self, path, synchronous="NORMAL"):
+        directory = os.path.dirname(path)
+        if directory and path != ':memory:':
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(self.SCHEMA)
+        logger.info("Opened SQLite storage at %s.", path)
+
+    def _write(self, statement, rows):
+        # The last column of a row is its JSON document; JSON output is ASCII, so characters are bytes.
+        BYTES_WRITTEN.labels(node=self.name, backend="sqlite").inc(sum(len(row[-1]) for row in rows if isinstance(row[-1], str)))
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(statement, rows)
+
+    def _query(self, statement, params=()):
+        with self._lock:
+            return self._conn.execute(statement, params).fetchall()
+
+    def _save_doc(self, doc_id, data):
+        self._write("INSERT OR REPLACE INTO documents (id, data) VALUES (?, ?)", [(doc_id, json.dumps(data))])
+
+    def _get_doc(self, doc_id):
+        rows = self._query("SELECT data FROM documents WHERE id = ?", (doc_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def save_block(self, block, overwrite=False):
+        try:
+            verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+            self._write(f"{verb} INTO blocks (height, data) VALUES (?, ?)", [(block.index, json.dumps(block.to_dict()))])
+        except sqlite3.Error as e:
+            logger.error("Error saving block: %s", e)
+
+    def save_blocks(self, blocks):
+        try:
+            self._write("INSERT OR REPLACE INTO blocks (height, data) VALUES (?, ?)",
+                        [(block.index, json.dumps(block.to_dict())) for block in blocks])
+        except sqlite3.Error as e:
+            logger.error("Error saving blocks: %s", e)
+
+    def load_blocks(self, start=0, end=None):
+        blocks = []
+        try:
+            if end is None:
+                rows = self._query("SELECT height, data FROM blocks WHERE height >= ? ORDER BY height", (start,))
+            else:
+                rows = self._query("SELECT height, data FROM blocks WHERE height BETWEEN ? AND ? ORDER BY height", (start, end))
+            for expected, (height, data) in enumerate(rows, start):
+                if height != expected:
+                    break
+                blocks.append(Block.from_dict(json.loads(data)))
+        except sqlite3.Error as e:
+            logger.error("Error loading blocks: %s", e)
+        return blocks
+
+    def save_checkpoint(self, checkpoint):
+        try:
+            self._save_doc("checkpoint", checkpoint)
+        except sqlite3.Error as e:
+            logger.error("Error saving checkpoint: %s", e)
+
+    def load_checkpoint(self):
+        try:
+            return self._get_doc("checkpoint")
+        except sqlite3.Error as e:
+            logger.error("Error loading checkpoint: %s", e)
+            return None
+
+    def save_tip(self, tip):
+        try:
+            self._save_doc("chain_tip", tip)
+        except sqlite3.Error as e:
+            logger.error("Error saving chain tip: %s", e)
+
+    def load_tip(self):
+        try:
+            return self._get_doc("chain_tip")
+        except sqlite3.Error as e:
+            logger.error("Error loading chain tip: %s", e)
+            return None
+
+    def append_delta(self, seq, delta):
+        try:
+            self._write("INSERT OR REPLACE INTO deltas (seq, data) VALUES (?, ?)", [(seq, json.dumps(delta))])
+        except sqlite3.Error as e:
+            logger.error("Error saving delta %s: %s", seq, e)
+
+    def load_deltas(self, start_seq=0):
+        deltas = []
+        try:
+            rows = self._query("SELECT seq, data FROM deltas WHERE seq >= ? ORDER BY seq", (start_seq,))
+            for expected, (seq, data) in enumerate(rows, start_seq):
+                if seq != expected:
+                    break
+                deltas.append(json.loads(data))
+        except sqlite3.Error as e:
+            logger.error("Error loading deltas: %s", e)
+        return deltas
+
+    def prune_deltas(self, before_seq):
+        try:
+            self._write("DELETE FROM deltas WHERE seq < ?", [(before_seq,)])
+        except sqlite3.Error as e:
+            logger.error("Error pruning deltas: %s", e)
+
+    def save_blockchain_state(self, blockchain_state):
+        try:
+            self._save_doc("blockchain_state", blockchain_state)
+            logger.debug("Blockchain state saved to SQLite.")
+        except sqlite3.Error as e:
+            logger.error("Error saving blockchain state: %s", e)
+
+    def load_blockchain_state(self):
+        try:
+            doc = self._get_doc("blockchain_state")
+            if doc is None:
+                logger.info("No blockchain state found in SQLite.")
+            return doc
+        except sqlite3.Error as e:
+            logger.error("Error loading blockchain state: %s", e)
+            return None
+
+    def delete_blockchain_state(self):
+        try:
+            self._write("DELETE FROM documents WHERE id = ?", [("blockchain_state",)])
+        except sqlite3.Error as e:
+            logger.error("Error deleting blockchain state: %s", e)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,98 @@
+import os
+from abc import ABC, abstractmethod
+from monitoring import metrics
+
+BYTES_WRITTEN = metrics.counter("blockchain_storage_bytes_written_total",
+                                "Serialized document bytes sent to storage, by backend.", ["node", "backend"])
+
+
+class Storage(ABC):
+    """What Blockchain persists through; CouchDBHandler and SQLiteHandler implement it.
+
+    Blocks are addressed by height. Checkpoint, chain tip and blockchain state
+    are single documents that are replaced on every save, and deltas are an
+    append-only log keyed by sequence number. Load methods return None (or an
+    empty list) when there is nothing stored. The transaction and address
+    indexes are rebuilt in memory from the loaded blocks, so they are not part
+    of the interface. Every method but close() is abstract, so a backend that
+    misses one fails when it is constructed.
+    """
+
+    # Names the node stored here; Blockchain uses it to label its metrics.
+    name = "default"
+
+    @abstractmethod
+    def save_block(self, block, overwrite=False):
+        pass
+
+    @abstractmethod
+    def save_blocks(self, blocks):
+        """Store or overwrite many blocks at once."""
+
+    @abstractmethod
+    def load_blocks(self, start=0, end=None):
+        """Consecutive blocks from start up to end (inclusive), stopping at the first gap."""
+
+    @abstractmethod
+    def save_checkpoint(self, checkpoint):
+        pass
+
+    @abstractmethod
+    def load_checkpoint(self):
+        pass
+
+    @abstractmethod
+    def save_tip(self, tip):
+        pass
+
+    @abstractmethod
+    def load_tip(self):
+        pass
+
+    @abstractmethod
+    def append_delta(self, seq, delta):
+        pass
+
+    @abstractmethod
+    def load_deltas(self, start_seq=0):
+        """The contiguous run of deltas starting at start_seq."""
+
+    @abstractmethod
+    def prune_deltas(self, before_seq):
+        """Delete deltas already folded into a checkpoint."""
+
+    @abstractmethod
+    def save_blockchain_state(self, blockchain_state):
+        pass
+
+    @abstractmethod
+    def load_blockchain_state(self):
+        pass
+
+    @abstractmethod
+    def delete_blockchain_state(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_storage(name, backend=None, **options):
+    """Open the storage backend named by `backend` or the STORAGE_BACKEND variable.
+
+    "couchdb" (the default) uses `name` as the database name; "sqlite" stores
+    the node in <SQLITE_DIR>/<name>.sqlite3, or at options["path"] if given;
+    "memory" keeps everything in the process and loses it on exit.
+    """
+    backend = backend or os.getenv('STORAGE_BACKEND', 'couchdb')
+    if backend == 'couchdb':
+        from database.couchdb_handler import CouchDBHandler
+        return CouchDBHandler(name, **options)
+    if backend == 'sqlite':
+        from database.sqlite_handler import SQLiteHandler
+        path = options.pop('path', None) or os.path.join(os.getenv('SQLITE_DIR', 'data'), f"{name}.sqlite3")
+        return SQLiteHandler(path, **options)
+    if backend == 'memory':
+        from database.memory_storage import MemoryStorage
+        return MemoryStorage(name)
+    raise ValueError(f"Unknown storage backend: {backend}")
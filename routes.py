@@ -1,15 +1,55 @@
+import json
+import logging
 import time
 import uuid
-from flask import request, jsonify
-import requests
+from flask import Response, request, jsonify
 from blockchain.block import Block
 from blockchain.blockchain import Blockchain
+from blockchain.serialization import BINARY_MIMETYPE, NDJSON_MIMETYPE, encode_blocks, iter_encode_blocks
 from blockchain.transaction import Transaction
 from blockchain.wallet import Wallet
 from cryptolib.crypto import Crypto
+from monitoring import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_TRANSACTION_BATCH = 1000
 
 
 def setup_routes(app, blockchain, port):
+    def _blocks_response(blocks, json_body, include_transactions=True):
+        """Send blocks in the binary encoding if the client prefers it, JSON otherwise."""
+        if request.accept_mimetypes.best_match(['application/json', BINARY_MIMETYPE]) == BINARY_MIMETYPE:
+            return Response(encode_blocks(blocks, include_transactions), mimetype=BINARY_MIMETYPE), 200
+        return jsonify(json_body()), 200
+
+    def _stream_blocks_response(blocks, json_prefix, json_suffix):
+        """Stream blocks one at a time as NDJSON, binary, or the usual JSON document.
+
+        The body is generated block by block, so memory does not grow with the
+        chain and clients can start processing before the last block is sent.
+        """
+        best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE, BINARY_MIMETYPE])
+        if best == BINARY_MIMETYPE:
+            return Response(iter_encode_blocks(blocks), mimetype=BINARY_MIMETYPE), 200
+        if best == NDJSON_MIMETYPE:
+            body = (json.dumps(block.to_dict()) + "\n" for block in blocks)
+            return Response(body, mimetype=NDJSON_MIMETYPE), 200
+
+        def json_body():
+            yield json_prefix
+            for position, block in enumerate(blocks):
+                yield ("," if position else "") + json.dumps(block.to_dict())
+            yield json_suffix
+        return Response(json_body(), mimetype='application/json'), 200
+
+    def _chain_range():
+        """Blocks between the optional `from` and `to` heights (inclusive)."""
+        height = blockchain.view.height
+        start = max(0, int(request.args.get('from', 0)))
+        end = min(height, int(request.args.get('to', height)))
+        return blockchain.get_blocks(start, end)
+
     @app.route('/wallet/create', methods=['POST'])
     def create_wallet():
         wallet = Wallet(blockchain)
@@ -26,14 +66,8 @@ def setup_routes(app, blockchain, port):
             return jsonify({"error": "Missing fields in request"}), 400
         try:
             transaction = blockchain.validate_and_process_transaction(sender, recipient, amount, private_key)
-            for peer in blockchain.peers:
-                try:
-                    response = requests.post(f'{peer}/transaction/add', json=transaction.to_dict(), timeout=5)
-                    if response.status_code != 200:
-                        print(f"Failed to broadcast transaction to {peer}: {response.text}")
-                except requests.exceptions.RequestException as e:
-                    print(f"Error broadcasting transaction to {peer}: {e}")
-            return jsonify(transaction.to_dict()), 201
+            blockchain.announce_transaction(transaction.to_dict())
+            return jsonify({**transaction.to_dict(), "status": "pending"}), 202
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
 
@@ -44,8 +78,44 @@ def setup_routes(app, blockchain, port):
         if not all(field in data for field in required_fields):
             return jsonify({"error": "Missing fields in transaction data"}), 400
         transaction = Transaction.from_dict(data)
-        blockchain.add_transaction(transaction.to_dict())
-        return jsonify({"message": "Transaction added"}), 200
+        try:
+            transaction_id = blockchain.add_transaction(transaction.to_dict())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if transaction_id is None:
+            return jsonify({"message": "Duplicate transaction", "status": "duplicate"}), 200
+        return jsonify({"message": "Transaction added", "status": "pending", "transaction_id": transaction_id}), 202
+
+    @app.route('/transactions/batch', methods=['POST'])
+    def add_transactions_batch():
+        data = request.get_json(silent=True)
+        items = data.get('transactions') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Expected a non-empty list of transactions"}), 400
+        if len(items) > MAX_TRANSACTION_BATCH:
+            return jsonify({"error": f"At most {MAX_TRANSACTION_BATCH} transactions per batch"}), 413
+
+        required_fields = ['sender', 'recipient', 'amount', 'signature']
+        results = [None] * len(items)
+        transactions = []
+        positions = []
+        for position, item in enumerate(items):
+            if not isinstance(item, dict) or not all(field in item for field in required_fields):
+                transaction_id = item.get('transaction_id') if isinstance(item, dict) else None
+                results[position] = {"transaction_id": transaction_id, "status": "rejected",
+                                     "error": "Missing fields in transaction data"}
+                continue
+            transactions.append(Transaction.from_dict(item).to_dict())
+            positions.append(position)
+
+        accepted = []
+        for position, transaction, result in zip(positions, transactions, blockchain.add_transactions(transactions)):
+            results[position] = result
+            if result["status"] == "accepted":
+                accepted.append(transaction)
+        if accepted:
+            blockchain.announce_transactions(accepted)
+        return jsonify({"results": results, "accepted": len(accepted)}), 200
 
     @app.route('/mine', methods=['GET'])
     def mine_block():
@@ -56,8 +126,11 @@ def setup_routes(app, blockchain, port):
 
     @app.route('/chain', methods=['GET'])
     def get_chain():
-        chain_data = [block.to_dict() for block in blockchain.chain]
-        return jsonify(chain_data), 200
+        try:
+            blocks = _chain_range()
+        except ValueError:
+            return jsonify({"error": "Invalid range parameters"}), 400
+        return _stream_blocks_response(blocks, "[", "]")
 
     @app.route('/balance/<wallet_address>', methods=['GET'])
     def get_balance(wallet_address):
@@ -66,7 +139,7 @@ def setup_routes(app, blockchain, port):
 
     @app.route('/pending_transactions', methods=['GET'])
     def get_pending_transactions():
-        pending_transactions = [Transaction.from_dict(tx).to_dict() for tx in list(blockchain.mempool.values())]
+        pending_transactions = [Transaction.from_dict(tx).to_dict() for tx in blockchain.view.pending]
         return jsonify({"pending_transactions": pending_transactions}), 200
 
     @app.route('/ico_funds', methods=['GET'])
@@ -85,32 +158,99 @@ def setup_routes(app, blockchain, port):
 
         incoming_chain_objs = [Block.from_dict(block_data) for block_data in incoming_chain]
 
-        if not blockchain.is_valid_chain(incoming_chain_objs):
-            return jsonify({"message": "Invalid incoming chain"}), 400
-
-        if len(incoming_chain_objs) > len(blockchain.chain):
-            blockchain.chain = incoming_chain_objs
-            blockchain.recalculate_wallets()
-            for tx in incoming_pending_transactions:
-                blockchain.mempool[tx['transaction_id']] = tx
-            blockchain.save_state()
-            print("Blockchain synchronized with incoming data.")
+        if len(incoming_chain_objs) > blockchain.view.height + 1:
+            if not blockchain.replace_chain(incoming_chain_objs):
+                return jsonify({"message": "Invalid incoming chain"}), 400
+            blockchain.merge_mempool(incoming_pending_transactions)
+            logger.debug("Blockchain synchronized with incoming data.")
             return jsonify({"message": "Blockchain updated"}), 200
         else:
-            for tx in incoming_pending_transactions:
-                blockchain.mempool[tx['transaction_id']] = tx
-            blockchain.save_state()
-            print("Mempool merged with incoming data.")
+            if not blockchain.is_valid_chain(incoming_chain_objs):
+                return jsonify({"message": "Invalid incoming chain"}), 400
+            blockchain.merge_mempool(incoming_pending_transactions)
+            logger.debug("Mempool merged with incoming data.")
             return jsonify({"message": "Mempool merged"}), 200
 
     @app.route('/request_chain', methods=['GET'])
     def request_chain():
-        chain_data = [block.to_dict() for block in blockchain.chain]
-        return jsonify({"chain": chain_data}), 200
+        try:
+            blocks = _chain_range()
+        except ValueError:
+            return jsonify({"error": "Invalid range parameters"}), 400
+        return _stream_blocks_response(blocks, '{"chain": [', "]}")
+
+    def _block_range(max_count, headers_only=False):
+        view = blockchain.view
+        height = view.height
+        start = max(0, int(request.args.get('from', 0)))
+        end = min(height, int(request.args.get('to', start + max_count - 1)), start + max_count - 1)
+        if headers_only:
+            # Header-only blocks still being loaded at startup are good enough here.
+            return view.blocks(start, end)
+        return blockchain.get_blocks(start, end)
+
+    @app.route('/chain/tip', methods=['GET'])
+    def get_chain_tip():
+        tip = blockchain.view.tip
+        return jsonify({"height": tip.index, "hash": tip.hash}), 200
+
+    @app.route('/headers', methods=['GET'])
+    def get_headers():
+        try:
+            blocks = _block_range(2000, headers_only=True)
+        except ValueError:
+            return jsonify({"error": "Invalid range parameters"}), 400
+        return _blocks_response(blocks, lambda: {"headers": [block.header_dict() for block in blocks]},
+                                include_transactions=False)
+
+    @app.route('/blocks', methods=['GET'])
+    def get_blocks():
+        try:
+            blocks = _block_range(500)
+        except ValueError:
+            return jsonify({"error": "Invalid range parameters"}), 400
+        return _blocks_response(blocks, lambda: {"blocks": [block.to_dict() for block in blocks]})
+
+    @app.route('/startup/stats', methods=['GET'])
+    def get_startup_stats():
+        return jsonify(blockchain.startup_stats), 200
+
+    @app.route('/writer/stats', methods=['GET'])
+    def get_writer_stats():
+        return jsonify(blockchain.writer.stats()), 200
+
+    # Process-wide metrics come from metrics.REGISTRY, where every series carries
+    # the node label and only this node's are served; these gauges are read from
+    # the node at scrape time.
+    node_metrics = metrics.Registry()
+    node_metrics.gauge("blockchain_chain_height", "Height of this node's chain tip.").set_function(
+        lambda: blockchain.view.height)
+    node_metrics.gauge("blockchain_mempool_transactions", "Transactions waiting in the mempool.").set_function(
+        lambda: len(blockchain.view.pending))
+    node_metrics.gauge("blockchain_mempool_bytes", "JSON size of the transactions in the mempool.").set_function(
+        lambda: blockchain.mempool.total_bytes)
+    node_metrics.gauge("blockchain_sync_lag_blocks", "Blocks between our tip and the highest tip a peer reported.").set_function(
+        lambda: max(0, blockchain.peer_height - blockchain.view.height))
+    node_metrics.gauge("blockchain_writer_queue_depth", "State changes waiting for the writer thread.").set_function(
+        lambda: blockchain.writer.stats()["queued"])
+    node_metrics.gauge("blockchain_startup_seconds", "Seconds from opening storage until this node was ready.").set_function(
+        lambda: blockchain.startup_stats["seconds"])
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        return Response(metrics.REGISTRY.render(node=blockchain.node) + node_metrics.render(), content_type=metrics.CONTENT_TYPE), 200
+
+    @app.route('/broadcast/stats', methods=['GET'])
+    def get_broadcast_stats():
+        return jsonify(blockchain.broadcaster.stats()), 200
+
+    @app.route('/validation/stats', methods=['GET'])
+    def get_validation_stats():
+        return jsonify(blockchain.validator.stats()), 200
 
     @app.route('/wallets', methods=['GET'])
     def get_wallets():
-        return jsonify({"wallets": blockchain.wallets}), 200
+        return jsonify({"wallets": blockchain.view.wallets}), 200
 
     @app.route('/add_block', methods=['POST'])
     def add_block():
@@ -122,13 +262,15 @@ def setup_routes(app, blockchain, port):
 
     @app.route('/transactions/<wallet_address>', methods=['GET'])
     def get_wallet_transactions(wallet_address):
-        transactions = []
-        for block in blockchain.chain:
-            for tx in block.transactions:
-                if tx['sender'] == wallet_address or tx['recipient'] == wallet_address:
-                    transaction_obj = Transaction.from_dict(tx)
-                    transactions.append(transaction_obj.to_dict())
-        return jsonify({"transactions": transactions}), 200
+        try:
+            limit = min(int(request.args.get('limit', 100)), 1000)
+            since_block = int(request.args.get('since', 0))
+            transactions, next_cursor = blockchain.get_address_transactions(
+                wallet_address, since_block, request.args.get('cursor'), limit
+            )
+        except ValueError:
+            return jsonify({"error": "Invalid pagination parameters"}), 400
+        return jsonify({"transactions": transactions, "next_cursor": next_cursor}), 200
 
     @app.route('/transaction/sign', methods=['POST'])
     def sign_transaction():
@@ -169,8 +311,7 @@ def setup_routes(app, blockchain, port):
             return jsonify({"error": "Missing fields in request"}), 400
 
         message = f"{sender}{recipient}{amount}"
-        print(f"Verifying transaction with message: {message}")
-        is_valid = Crypto.verify_signature(sender, message, signature)
+        is_valid = blockchain.verifier.verify(sender, message, signature)
         verification_result = {
             "is_valid": is_valid
         }
@@ -186,35 +327,31 @@ def setup_routes(app, blockchain, port):
         try:
             transaction = Transaction.from_dict(data)
             message = f"{transaction.sender}{transaction.recipient}{transaction.amount}"
-            if not Crypto.verify_signature(transaction.sender, message, transaction.signature):
+            if not blockchain.verifier.verify(transaction.sender, message, transaction.signature):
                 return jsonify({"error": "Invalid signature"}), 400
 
             if blockchain.get_balance(transaction.sender) < transaction.amount:
                 return jsonify({"error": "Insufficient funds"}), 400
 
-            blockchain.add_transaction(transaction.to_dict())
-
-            for peer in blockchain.peers:
-                try:
-                    response = requests.post(f'{peer}/transaction/add', json=transaction.to_dict(), timeout=5)
-                    if response.status_code != 200:
-                        print(f"Failed to broadcast transaction to {peer}: {response.text}")
-                except requests.exceptions.RequestException as e:
-                    print(f"Error broadcasting transaction to {peer}: {e}")
+            transaction_data = transaction.to_dict()
+            if blockchain.add_transaction(transaction_data):
+                blockchain.announce_transaction(transaction_data)
 
             return jsonify({"message": "Off-chain transaction submitted successfully"}), 200
 
         except Exception as e:
             return jsonify({"error": str(e)}), 400
 
+    @app.route('/transaction/<transaction_id>/proof', methods=['GET'])
+    def get_transaction_proof(transaction_id):
+        proof = blockchain.get_merkle_proof(transaction_id)
+        if proof is None:
+            return jsonify({"error": "Transaction not found in a block"}), 404
+        return jsonify(proof), 200
+
     @app.route('/transaction/<transaction_id>', methods=['GET'])
     def get_transaction_by_id(transaction_id):
-        for block in blockchain.chain:
-            for tx in block.transactions:
-                if tx.get('transaction_id') == transaction_id:
-                    transaction_obj = Transaction.from_dict(tx)
-                    return jsonify(transaction_obj.to_dict()), 200
-        tx = blockchain.mempool.get(transaction_id)
+        tx = blockchain.find_transaction(transaction_id)
         if tx:
             transaction_obj = Transaction.from_dict(tx)
             return jsonify(transaction_obj.to_dict()), 200
@@ -1,12 +1,22 @@
+import logging
+import os
 import threading
 import requests
 import time
-from werkzeug.serving import make_server
 from flask import Flask
+from asgi import AsgiApp, run_asgi
 from routes import setup_routes
 from blockchain.blockchain import Blockchain
-from database.couchdb_handler import CouchDBHandler
+from blockchain.chain_sync import ChainSynchronizer
+from blockchain.miner import ParallelMiner
+from blockchain.mining_scheduler import MiningScheduler
+from blockchain.p2p import P2PNetwork
+from cryptolib.verifier import SignatureVerifier
+from database.storage import create_storage
 from flask_cors import CORS
+from monitoring.logs import configure_logging
+
+logger = logging.getLogger(__name__)
 
 
 def create_app(blockchain, port):
@@ -18,64 +28,82 @@ def create_app(blockchain, port):
     return app
 
 
+def create_asgi_app(blockchain, port, workers=16, heavy_workers=2):
+    return AsgiApp(create_app(blockchain, port), workers, heavy_workers)
+
+
 def run_app(blockchain, port):
-    app = create_app(blockchain, port)
-    server = make_server('0.0.0.0', port, app)
-    server.serve_forever()
+    run_asgi(create_asgi_app(blockchain, port), '0.0.0.0', port)
 
 
-def sync_with_peers(blockchain, port, peers):
+def sync_with_peers(blockchain, peers, interval=10):
+    """Poll each peer over HTTP every `interval` seconds: headers-first chain sync, then its mempool.
+
+    Used instead of the gossip layer when a node runs with P2P_ENABLED=0.
+    """
+    synchronizer = ChainSynchronizer(blockchain)
     while True:
-        time.sleep(10)
+        time.sleep(interval)
         for peer in peers:
             try:
-                response_chain = requests.get(f'{peer}/request_chain', timeout=5)
-                response_wallets = requests.get(f'{peer}/wallets', timeout=5)
+                applied = synchronizer.sync_with_peer(peer)
+                if applied:
+                    logger.info("Synchronized %s blocks from peer %s", applied, peer)
                 response_pending_transactions = requests.get(f'{peer}/pending_transactions', timeout=5)
-
-                if response_chain.status_code == 200 and response_wallets.status_code == 200 and response_pending_transactions.status_code == 200:
-                    chain = response_chain.json().get('chain')
-                    wallets = response_wallets.json().get('wallets')
-                    pending_transactions = response_pending_transactions.json().get('pending_transactions')
-
-                    if chain and wallets and pending_transactions:
-                        sync_data = {
-                            'chain': chain,
-                            'wallets': wallets,
-                            'pending_transactions': pending_transactions
-                        }
-                        sync_response = requests.post(f'http://127.0.0.1:{port}/sync', json=sync_data, timeout=5)
-                        if sync_response.status_code == 200:
-                            print(f"Synchronized blockchain with peer {peer}")
+                if response_pending_transactions.status_code == 200:
+                    blockchain.merge_mempool(response_pending_transactions.json().get('pending_transactions', []))
             except requests.exceptions.RequestException as e:
-                print(f"Error syncing with peer {peer}: {e}")
+                logger.warning("Error syncing with peer %s: %s", peer, e)
+            except Exception as e:
+                logger.error("Error syncing with peer %s: %s", peer, e)
 
 
 def main():
+    configure_logging()
     fixed_genesis_private_key = "66DfCadKUjJBkBbOlURslW1V020v6MzLq7ExQb15j_A"
     fixed_genesis_public_key = "AtV2Ohy1KCwD_RAJ4D6yB60I-CxBbtpubhGmr55LTtMQ"
 
+    # (HTTP port, database, HTTP peers, P2P port, P2P seeds)
     configs = [
-        (5000, 'blockchain_node1', ['http://127.0.0.1:5001', 'http://127.0.0.1:5002']),
-        (5001, 'blockchain_node2', ['http://127.0.0.1:5000', 'http://127.0.0.1:5002']),
-        (5002, 'blockchain_node3', ['http://127.0.0.1:5000', 'http://127.0.0.1:5001'])
+        (5000, 'blockchain_node1', ['http://127.0.0.1:5001', 'http://127.0.0.1:5002'],
+         6000, ['ws://127.0.0.1:6001', 'ws://127.0.0.1:6002']),
+        (5001, 'blockchain_node2', ['http://127.0.0.1:5000', 'http://127.0.0.1:5002'],
+         6001, ['ws://127.0.0.1:6000', 'ws://127.0.0.1:6002']),
+        (5002, 'blockchain_node3', ['http://127.0.0.1:5000', 'http://127.0.0.1:5001'],
+         6002, ['ws://127.0.0.1:6000', 'ws://127.0.0.1:6001'])
     ]
+    # P2P_ENABLED=0 runs the nodes without the WebSocket layer; they then
+    # broadcast over HTTP and poll their peers every HTTP_SYNC_INTERVAL seconds.
+    p2p_enabled = os.getenv('P2P_ENABLED', '1') != '0'
+    sync_interval = float(os.getenv('HTTP_SYNC_INTERVAL', '10'))
     threads = []
-    for port, db_name, peers in configs:
-        db_handler = CouchDBHandler(db_name)
-        blockchain = Blockchain(db_handler, fixed_genesis_private_key, fixed_genesis_public_key)
+    verifier = SignatureVerifier()
+    for port, db_name, peers, p2p_port, seeds in configs:
+        # STORAGE_BACKEND=sqlite runs the node on an embedded database file instead of CouchDB.
+        db_handler = create_storage(db_name)
+        blockchain = Blockchain(db_handler, fixed_genesis_private_key, fixed_genesis_public_key,
+                                miner=ParallelMiner(), verifier=verifier,
+                                snapshot_path=os.path.join(os.getenv('SNAPSHOT_DIR', 'data'), f"{db_name}.snapshot.json"))
         blockchain.peers = peers
+        if p2p_enabled:
+            # Blocks and transactions travel over the WebSocket gossip layer; it
+            # also catches up with peers on connect, so no HTTP polling is needed.
+            blockchain.gossip = P2PNetwork('0.0.0.0', p2p_port, blockchain, seeds=seeds)
+            blockchain.gossip.start()
+        else:
+            sync_thread = threading.Thread(target=sync_with_peers, args=(blockchain, peers, sync_interval), daemon=True)
+            sync_thread.start()
+            threads.append(sync_thread)
+        blockchain.mining_scheduler = MiningScheduler(blockchain)
+        blockchain.mining_scheduler.start()
         app_thread = threading.Thread(target=run_app, args=(blockchain, port), daemon=True)
         app_thread.start()
         threads.append(app_thread)
-        sync_thread = threading.Thread(target=sync_with_peers, args=(blockchain, port, peers), daemon=True)
-        sync_thread.start()
-        threads.append(sync_thread)
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        print("Shutting down blockchain nodes.")
+        logger.info("Shutting down blockchain nodes.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,36 @@
+import pytest
+from blockchain.blockchain import Blockchain
+from cryptolib.crypto import Crypto
+from database.memory_storage import MemoryStorage
+
+GENESIS_PRIVATE_KEY = "66DfCadKUjJBkBbOlURslW1V020v6MzLq7ExQb15j_A"
+GENESIS_PUBLIC_KEY = "AtV2Ohy1KCwD_RAJ4D6yB60I-CxBbtpubhGmr55LTtMQ"
+
+
+@pytest.fixture
+def make_blockchain():
+    """Factory for nodes on the fixed genesis keys at difficulty 1.
+
+    Auto-mining is off unless a test passes auto_mine_threshold; other options
+    go to Blockchain, and the storage defaults to a fresh MemoryStorage.
+    """
+    def make(storage=None, auto_mine_threshold=10 ** 9, **options):
+        blockchain = Blockchain(storage or MemoryStorage(), GENESIS_PRIVATE_KEY, GENESIS_PUBLIC_KEY,
+                                difficulty=1, **options)
+        blockchain.auto_mine_threshold = auto_mine_threshold
+        return blockchain
+    return make
+
+
+@pytest.fixture
+def signed_transfer():
+    """Factory for a transfer from the genesis wallet with a fresh signature."""
+    def sign(recipient, amount=1):
+        signature = Crypto.sign_transaction(GENESIS_PRIVATE_KEY, f"{GENESIS_PUBLIC_KEY}{recipient}{amount}")
+        return {"sender": GENESIS_PUBLIC_KEY, "recipient": recipient, "amount": amount, "signature": signature}
+    return sign
+
+
+@pytest.fixture(scope="module")
+def recipient():
+    return Crypto.generate_keypair()[1]
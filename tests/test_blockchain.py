@@ -0,0 +1,264 @@
+import threading
+import pytest
+from blockchain.block import Block
+from blockchain.indexes import TransactionIndex
+from blockchain.miner import find_nonce
+from database.memory_storage import MemoryStorage
+
+
+class GatedMiner:
+    """Mines at difficulty 1 once `release` is set, or gives up when cancelled."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.cancelled = False
+        self.finished = False
+        self.last_attempts = 0
+
+    def mine(self, header_prefix, difficulty, start_nonce=0):
+        self.cancelled = False
+        self.started.set()
+        self.release.wait(10)
+        if self.cancelled:
+            return None
+        nonce, _, self.last_attempts = find_nonce(header_prefix, difficulty, start_nonce)
+        self.finished = True
+        return nonce
+
+    def cancel(self):
+        self.cancelled = True
+        self.release.set()
+
+
+def test_lookups_wait_for_the_view_that_holds_the_block(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    transaction_id = blockchain.add_transaction(signed_transfer(recipient))
+    block = blockchain.writer.submit(blockchain._block_template, None, None)
+    block.mine(difficulty=1)
+    appended, release = threading.Event(), threading.Event()
+
+    def append_and_hold():
+        blockchain._append_mined_block(block)
+        appended.set()
+        release.wait(10)
+
+    writer = threading.Thread(target=blockchain.writer.submit, args=(append_and_hold,))
+    writer.start()
+    assert appended.wait(10)
+    try:
+        # The indexes already hold the block; the published view does not.
+        assert transaction_id in blockchain.tx_index
+        assert blockchain.find_transaction(transaction_id) is None
+        assert blockchain.get_merkle_proof(transaction_id) is None
+        transactions, cursor = blockchain.get_address_transactions(recipient)
+        assert transactions == [] and cursor is None
+    finally:
+        release.set()
+        writer.join()
+    assert blockchain.find_transaction(transaction_id)["transaction_id"] == transaction_id
+    assert blockchain.get_merkle_proof(transaction_id)["block_index"] == block.index
+    assert [tx["transaction_id"] for tx in blockchain.get_address_transactions(recipient)[0]] == [transaction_id]
+
+
+def test_lookups_ignore_locations_from_another_branch(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    transaction_id = blockchain.add_transaction(signed_transfer(recipient))
+    blockchain.mine()
+    view = blockchain.view
+    # Same height, different transaction: what a reorg leaves in the index for the old view.
+    blockchain.tx_index._locations["other"] = blockchain.tx_index.get(transaction_id)
+    assert blockchain.find_transaction("other") is None
+    assert blockchain.get_merkle_proof("other") is None
+    assert blockchain.view is view
+
+
+def test_auto_mining_does_not_hold_up_the_writer(make_blockchain, signed_transfer, recipient):
+    miner = GatedMiner()
+    blockchain = make_blockchain(miner=miner, auto_mine_threshold=1)
+    transaction_id = blockchain.add_transaction(signed_transfer(recipient))
+    assert not miner.finished
+    assert miner.started.wait(10)
+    # The proof-of-work is waiting on the gate; writes still go through.
+    blockchain.update_wallets({"someone": 5})
+    assert blockchain.view.wallets["someone"] == 5
+    miner.release.set()
+    for _ in range(100):
+        if blockchain.view.height == 1:
+            break
+        threading.Event().wait(0.05)
+    assert blockchain.find_transaction(transaction_id)["transaction_id"] == transaction_id
+    assert blockchain.view.height == 1
+
+
+def test_batches_count_repeated_signatures_as_duplicates(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    pending = signed_transfer(recipient)
+    blockchain.add_transaction(dict(pending))
+    first = signed_transfer(recipient, 2)
+    batch = [
+        {**pending, "transaction_id": "replayed"},
+        {**first, "transaction_id": "first"},
+        {**first, "transaction_id": "again"},
+        {**signed_transfer(recipient, 3), "transaction_id": ["not", "a", "string"]},
+        {**signed_transfer(recipient, 4), "transaction_id": 7}
+    ]
+    results = blockchain.add_transactions(batch)
+    assert [result["status"] for result in results] == ["duplicate", "accepted", "duplicate", "rejected", "rejected"]
+    assert results[3]["error"] == results[4]["error"] == "invalid transaction_id in transaction"
+    assert len(blockchain.mempool) == 2
+
+
+def test_add_transaction_rejects_a_non_string_id(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    with pytest.raises(ValueError):
+        blockchain.add_transaction({**signed_transfer(recipient), "transaction_id": {"id": 1}})
+    assert len(blockchain.mempool) == 0
+
+
+def _peer_block(blockchain, transactions, previous=None):
+    previous = previous or blockchain.chain[-1]
+    block = Block(previous.index + 1, [dict(tx) for tx in transactions], previous.hash,
+                  timestamp=previous.timestamp + 1)
+    block.mine(difficulty=1)
+    return block
+
+
+def test_add_block_rejects_confirmed_transactions(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    blockchain.add_transaction(signed_transfer(recipient))
+    mined = blockchain.mine().transactions[0]
+    balance = blockchain.wallets[recipient]
+    for replay in (mined, {**mined, "transaction_id": "new-id"}):
+        assert not blockchain.add_block(_peer_block(blockchain, [replay]))
+        assert blockchain.validator.last_error.startswith("replayed transaction")
+    assert blockchain.wallets[recipient] == balance
+    assert blockchain.tx_index.get(mined["transaction_id"]) == (1, 0)
+
+
+def test_add_block_rejects_a_signature_repeated_within_the_block(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    transfer = signed_transfer(recipient)
+    block = _peer_block(blockchain, [{**transfer, "transaction_id": "a"}, {**transfer, "transaction_id": "b"}])
+    assert not blockchain.add_block(block)
+    assert len(blockchain.chain) == 1
+
+
+def test_fork_rejects_a_replay_within_its_suffix(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    blockchain.add_transaction(signed_transfer(recipient))
+    blockchain.mine()
+    state = (list(blockchain.chain), dict(blockchain.wallets))
+    transfer = {**signed_transfer(recipient), "transaction_id": "fork-a"}
+    first = _peer_block(blockchain, [transfer], blockchain.chain[0])
+    second = _peer_block(blockchain, [{**transfer, "transaction_id": "fork-b"}], first)
+    assert not blockchain.replace_chain(blockchain.chain[:1] + [first, second])
+    assert (blockchain.chain, blockchain.wallets) == state
+    # The same fork without the replay is taken.
+    second = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-b"}], first)
+    assert blockchain.replace_chain(blockchain.chain[:1] + [first, second])
+    assert blockchain.wallets[recipient] == 2
+
+
+def test_mined_signatures_are_duplicates_under_a_new_id(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    blockchain.add_transaction(signed_transfer(recipient))
+    mined = blockchain.mine().transactions[0]
+    resubmitted = {key: value for key, value in mined.items() if key != "timestamp"}
+    assert blockchain.add_transaction({**resubmitted, "transaction_id": "single"}) is None
+    assert blockchain.add_transactions([{**resubmitted, "transaction_id": "batched"}])[0]["status"] == "duplicate"
+    assert blockchain.merge_mempool([{**resubmitted, "transaction_id": "gossiped"}]) == []
+    assert len(blockchain.mempool) == 0
+    assert blockchain.mine() is None
+
+
+def test_peer_block_evicts_pending_copies_of_its_signatures(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    transfer = signed_transfer(recipient)
+    blockchain.add_transaction({**transfer, "transaction_id": "pending"})
+    assert blockchain.add_block(_peer_block(blockchain, [{**transfer, "transaction_id": "mined"}]))
+    assert "pending" not in blockchain.mempool
+    assert blockchain.wallets[recipient] == 1
+
+
+def _mine_transfers(blockchain, signed_transfer, recipient, count):
+    """Mine `count` blocks of one transfer each; returns their transaction ids."""
+    ids = []
+    for _ in range(count):
+        blockchain.add_transaction(signed_transfer(recipient))
+        ids.append(blockchain.mine().transactions[0]["transaction_id"])
+    return ids
+
+
+@pytest.mark.parametrize("persistence_mode", ["state", "append"])
+def test_transaction_index_is_rebuilt_on_load(make_blockchain, signed_transfer, recipient, persistence_mode):
+    storage = MemoryStorage()
+    blockchain = make_blockchain(storage, persistence_mode=persistence_mode)
+    ids = _mine_transfers(blockchain, signed_transfer, recipient, 2)
+    loaded = make_blockchain(storage, persistence_mode=persistence_mode)
+    assert loaded.tx_index.to_dict() == blockchain.tx_index.to_dict()
+    assert [loaded.tx_index.get(transaction_id) for transaction_id in ids] == [(1, 0), (2, 0)]
+    assert loaded.find_transaction(ids[1])["transaction_id"] == ids[1]
+
+
+def test_reorg_reindexes_only_the_replaced_blocks(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    kept, replaced = _mine_transfers(blockchain, signed_transfer, recipient, 2)
+    replaced_signature = blockchain.chain[2].transactions[0]["signature"]
+    first = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-2"}], blockchain.chain[1])
+    second = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-3"}], first)
+    assert blockchain.replace_chain(blockchain.chain[:2] + [first, second])
+    assert blockchain.tx_index.get(kept) == (1, 0)
+    assert replaced not in blockchain.tx_index
+    assert blockchain.tx_index.signature_height(replaced_signature) is None
+    assert [blockchain.tx_index.get(transaction_id) for transaction_id in ("fork-2", "fork-3")] == [(2, 0), (3, 0)]
+    rebuilt = TransactionIndex()
+    rebuilt.rebuild(blockchain.chain)
+    assert blockchain.tx_index.to_dict() == rebuilt.to_dict()
+    assert blockchain.find_transaction(replaced) is None
+
+
+def test_find_fork_point(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    _mine_transfers(blockchain, signed_transfer, recipient, 2)
+    extension = _peer_block(blockchain, [signed_transfer(recipient)])
+    assert blockchain.find_fork_point(blockchain.chain + [extension]) == 3
+    fork = _peer_block(blockchain, [signed_transfer(recipient)], blockchain.chain[1])
+    assert blockchain.find_fork_point(blockchain.chain[:2] + [fork]) == 2
+    assert make_blockchain().find_fork_point(blockchain.chain[:1]) == 1
+    other_genesis = Block(0, [], "0", timestamp=1)
+    other_genesis.mine(difficulty=1)
+    assert blockchain.find_fork_point([other_genesis, fork]) == 0
+    assert not blockchain.is_valid_chain([other_genesis, fork])
+
+
+def test_only_the_divergent_suffix_is_validated(make_blockchain, signed_transfer, recipient, monkeypatch):
+    blockchain = make_blockchain()
+    _mine_transfers(blockchain, signed_transfer, recipient, 3)
+    validated = []
+    validate = blockchain.validator.validate
+    monkeypatch.setattr(blockchain.validator, "validate",
+                        lambda block, *args, **kwargs: validated.append(block.index) or validate(block, *args, **kwargs))
+    first = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-3"}], blockchain.chain[2])
+    second = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-4"}], first)
+    assert blockchain.replace_chain(blockchain.chain[:3] + [first, second])
+    assert validated == [3, 4]
+    assert blockchain.wallets[recipient] == 4
+
+
+def test_rejected_fork_leaves_the_state_intact(make_blockchain, signed_transfer, recipient):
+    blockchain = make_blockchain()
+    _mine_transfers(blockchain, signed_transfer, recipient, 2)
+    blockchain.add_transaction(signed_transfer(recipient))
+
+    def state():
+        return ([block.hash for block in blockchain.chain], dict(blockchain.wallets), blockchain.tx_index.to_dict(),
+                blockchain.address_index.to_dict(), list(blockchain.mempool))
+
+    before = state()
+    first = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-1"}], blockchain.chain[0])
+    second = _peer_block(blockchain, [{**signed_transfer(recipient, amount=2000000), "transaction_id": "fork-2"}], first)
+    third = _peer_block(blockchain, [{**signed_transfer(recipient), "transaction_id": "fork-3"}], second)
+    assert not blockchain.replace_chain(blockchain.chain[:1] + [first, second, third])
+    assert blockchain.validator.last_error == "insufficient funds for transaction fork-2"
+    assert state() == before
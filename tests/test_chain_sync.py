@@ -0,0 +1,66 @@
+import pytest
+from blockchain.block import Block
+from blockchain.chain_sync import ChainSynchronizer
+
+PEER = "http://peer:5000"
+
+
+@pytest.fixture
+def peer_blocks(signed_transfer, recipient):
+    """Factory for `count` valid blocks extending `previous`, one transfer each."""
+    def extend(previous, count):
+        blocks = []
+        for _ in range(count):
+            transfer = {**signed_transfer(recipient), "transaction_id": f"peer-{previous.index + 1}"}
+            previous = Block(previous.index + 1, [transfer], previous.hash, timestamp=previous.timestamp + 1)
+            previous.mine(difficulty=1)
+            blocks.append(previous)
+        return blocks
+    return extend
+
+
+def _synchronizer(blockchain, blocks, monkeypatch):
+    """A ChainSynchronizer whose peer streams `blocks`; the list returned records which were sent."""
+    sent = []
+
+    def stream_blocks(peer, start, end):
+        for block in blocks:
+            sent.append(block.index)
+            yield block
+
+    synchronizer = ChainSynchronizer(blockchain)
+    monkeypatch.setattr(synchronizer, "stream_blocks", stream_blocks)
+    return synchronizer, sent
+
+
+def test_import_stream_applies_blocks_matching_their_headers(make_blockchain, peer_blocks, monkeypatch):
+    blockchain = make_blockchain()
+    blocks = peer_blocks(blockchain.chain[-1], 3)
+    synchronizer, _ = _synchronizer(blockchain, blocks, monkeypatch)
+    assert synchronizer.import_stream(PEER, [block.header_dict() for block in blocks]) == 3
+    assert [block.hash for block in blockchain.chain[1:]] == [block.hash for block in blocks]
+
+
+def test_import_stream_stops_at_a_block_that_does_not_match_its_header(make_blockchain, peer_blocks, monkeypatch):
+    blockchain = make_blockchain()
+    blocks = peer_blocks(blockchain.chain[-1], 3)
+    headers = [block.header_dict() for block in blocks]
+    headers[1] = {**headers[1], "hash": "0" * 64}
+    synchronizer, sent = _synchronizer(blockchain, blocks, monkeypatch)
+    assert synchronizer.import_stream(PEER, headers) == 1
+    assert sent == [1, 2]
+    assert len(blockchain.chain) == 2
+
+
+def test_import_stream_stops_at_an_invalid_block(make_blockchain, peer_blocks, recipient, monkeypatch):
+    blockchain = make_blockchain()
+    first = peer_blocks(blockchain.chain[-1], 1)[0]
+    # Replays the first block's transfer, so add_block refuses it.
+    replay = Block(2, [dict(first.transactions[0])], first.hash, timestamp=first.timestamp + 1)
+    replay.mine(difficulty=1)
+    blocks = [first, replay] + peer_blocks(replay, 1)
+    synchronizer, sent = _synchronizer(blockchain, blocks, monkeypatch)
+    assert synchronizer.import_stream(PEER, [block.header_dict() for block in blocks]) == 1
+    assert sent == [1, 2]
+    assert [block.hash for block in blockchain.chain] == [blockchain.chain[0].hash, first.hash]
+    assert blockchain.wallets[recipient] == 1
@@ -0,0 +1,105 @@
+import uuid
+import pytest
+from blockchain.block import Block
+from database.couchdb_handler import CouchDBHandler
+from database.fake_couchdb import FakeCouchDB
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = FakeCouchDB().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def db_name(server):
+    return f"test_{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def handler(server, db_name):
+    handler = CouchDBHandler(db_name, url=server.url, page_size=4)
+    yield handler
+    handler.close()
+
+
+def _chain(length):
+    chain = [Block(0, [], "0", timestamp=1.0)]
+    for index in range(1, length):
+        transaction = {"sender": "alice", "recipient": "bob", "amount": index, "transaction_id": f"tx{index}"}
+        chain.append(Block(index, [transaction], chain[-1].hash, timestamp=float(index + 1)))
+    return chain
+
+
+def test_save_and_load_blocks_in_pages(server, handler):
+    chain = _chain(11)
+    requests_before = server.requests
+    handler.save_blocks(chain)
+    assert server.requests - requests_before == 3
+    loaded = handler.load_blocks()
+    assert [block.to_dict() for block in loaded] == [block.to_dict() for block in chain]
+    assert [block.index for block in handler.load_blocks(3, 9)] == list(range(3, 10))
+
+
+def test_load_blocks_stops_at_first_gap(handler):
+    chain = _chain(8)
+    handler.save_blocks(chain[:5] + chain[6:])
+    assert [block.index for block in handler.load_blocks()] == [0, 1, 2, 3, 4]
+
+
+def test_save_blocks_overwrites_existing_blocks(server, db_name, handler):
+    chain = _chain(6)
+    handler.save_blocks(chain)
+    replacement = Block(3, [{"sender": "carol", "recipient": "dave", "amount": 9}], chain[2].hash, timestamp=99.0)
+    # Another handler has no cached revisions, so its bulk write conflicts and is retried.
+    other = CouchDBHandler(db_name, url=server.url, page_size=4)
+    other.save_blocks([replacement])
+    assert handler.load_blocks(3, 3)[0].to_dict() == replacement.to_dict()
+    other.save_block(chain[3])
+    assert handler.load_blocks(3, 3)[0].hash == replacement.hash
+    other.save_block(chain[3], overwrite=True)
+    assert handler.load_blocks(3, 3)[0].hash == chain[3].hash
+
+
+def test_document_round_trips(handler):
+    assert handler.load_checkpoint() is None
+    assert handler.load_tip() is None
+    assert handler.load_blockchain_state() is None
+    checkpoint = {"height": 7, "delta_seq": 12, "mempool": [], "wallets": {"alice": 5}}
+    handler.save_checkpoint(checkpoint)
+    handler.save_checkpoint(dict(checkpoint, height=8))
+    handler.save_tip({"index": 8, "hash": "ab" * 32})
+    handler.save_blockchain_state({"chain": [], "wallets": {"bob": 1}})
+    assert {key: value for key, value in handler.load_checkpoint().items() if not key.startswith('_')} == \
+        dict(checkpoint, height=8)
+    assert handler.load_tip()["index"] == 8
+    assert handler.load_blockchain_state()["wallets"] == {"bob": 1}
+    handler.delete_blockchain_state()
+    assert handler.load_blockchain_state() is None
+
+
+def test_stale_cached_revision_is_retried(server, db_name, handler):
+    handler.save_checkpoint({"height": 1})
+    other = CouchDBHandler(db_name, url=server.url)
+    other.save_checkpoint({"height": 2})
+    requests_before = server.requests
+    handler.save_checkpoint({"height": 3})
+    # PUT with the stale revision (409), HEAD for the current one, PUT again.
+    assert server.requests - requests_before == 3
+    assert other.load_checkpoint()["height"] == 3
+    requests_before = server.requests
+    handler.save_checkpoint({"height": 4})
+    assert server.requests - requests_before == 1
+
+
+def test_deltas_load_contiguously_and_prune(handler):
+    for seq in range(10):
+        handler.append_delta(seq, {"op": "balances", "seq": seq, "wallets": {"alice": seq}})
+    assert [delta["seq"] for delta in handler.load_deltas()] == list(range(10))
+    assert [delta["seq"] for delta in handler.load_deltas(6)] == [6, 7, 8, 9]
+    handler.prune_deltas(7)
+    assert handler.load_deltas() == []
+    assert [delta["seq"] for delta in handler.load_deltas(7)] == [7, 8, 9]
+    handler.append_delta(11, {"op": "balances", "seq": 11, "wallets": {}})
+    assert [delta["seq"] for delta in handler.load_deltas(7)] == [7, 8, 9]
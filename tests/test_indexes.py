@@ -0,0 +1,54 @@
+import pytest
+from blockchain.block import Block
+from blockchain.indexes import AddressIndex, TransactionIndex
+
+
+def _block(index, *transfers):
+    transactions = [{"sender": sender, "recipient": recipient, "amount": 1, "signature": f"sig-{index}-{position}",
+                     "transaction_id": f"tx-{index}-{position}"}
+                    for position, (sender, recipient) in enumerate(transfers)]
+    return Block(index, transactions, "0" * 64, timestamp=1700000000.0 + index)
+
+
+def test_address_truncate_across_blocks_sharing_an_address():
+    chain = [_block(0, ("ICO", "alice")), _block(1, ("alice", "bob")), _block(2, ("bob", "carol")),
+             _block(3, ("alice", "bob"), ("bob", "alice"))]
+    index = AddressIndex()
+    index.rebuild(chain)
+    index.truncate(1)
+    expected = AddressIndex()
+    expected.rebuild(chain[:1])
+    assert index.to_dict() == expected.to_dict()
+    assert index.query("bob") == ([], None)
+    assert index.query("alice") == ([(0, 0)], None)
+
+
+@pytest.mark.parametrize("options", [{"limit": 0}, {"limit": -5}, {"since_block": -1}])
+def test_address_query_rejects_out_of_range_pages(options):
+    index = AddressIndex()
+    index.rebuild([_block(0, ("ICO", "alice")), _block(1, ("alice", "bob"))])
+    with pytest.raises(ValueError):
+        index.query("alice", **options)
+
+
+def test_transaction_index_keeps_the_earliest_block_of_a_repeat():
+    index = TransactionIndex()
+    first = _block(1, ("alice", "bob"))
+    repeat = Block(2, [dict(first.transactions[0])], first.hash, timestamp=first.timestamp + 1)
+    index.rebuild([_block(0, ("ICO", "alice")), first, repeat])
+    assert index.get("tx-1-0") == (1, 0)
+    assert index.signature_height("sig-1-0") == 1
+    index.truncate(2)
+    assert index.get("tx-1-0") == (1, 0)
+    assert index.signature_height("sig-1-0") == 1
+    index.truncate(1)
+    assert "tx-1-0" not in index and index.signature_height("sig-1-0") is None
+
+
+def test_transaction_index_round_trips_signatures():
+    index = TransactionIndex()
+    index.rebuild([_block(0, ("ICO", "alice")), _block(1, ("alice", "bob"), ("bob", "carol"))])
+    restored = TransactionIndex()
+    restored.restore(index.to_dict())
+    assert restored.to_dict() == index.to_dict()
+    assert restored.get("tx-1-1") == (1, 1) and restored.signature_height("sig-1-1") == 1
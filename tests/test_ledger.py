@@ -0,0 +1,77 @@
+from blockchain.block import Block
+from blockchain.ledger import Ledger
+
+GENESIS = {"genesis": 100}
+
+
+def _chain(transfers):
+    """Genesis plus one block per (sender, recipient, amount) transfer."""
+    chain = [Block(0, [{"sender": "ICO", "recipient": "genesis", "amount": 100}], "0", timestamp=1.0)]
+    for index, (sender, recipient, amount) in enumerate(transfers, start=1):
+        transaction = {"sender": sender, "recipient": recipient, "amount": amount, "transaction_id": f"tx{index}"}
+        chain.append(Block(index, [transaction], chain[-1].hash, timestamp=float(index + 1)))
+    return chain
+
+
+def _apply(ledger, chain):
+    balances = dict(GENESIS)
+    for block in chain[1:]:
+        ledger.apply_block(balances, block)
+    return balances
+
+
+def test_rollback_restores_balances_at_fork():
+    chain = _chain([("genesis", "a", 10), ("a", "b", 4), ("genesis", "b", 7)])
+    ledger = Ledger()
+    balances = _apply(ledger, chain)
+    assert balances == {"genesis": 83, "a": 6, "b": 11}
+    assert ledger.rollback(balances, 3, 2)
+    assert balances == {"genesis": 90, "a": 10, "b": 0}
+
+
+def test_rollback_fails_without_undo_data():
+    chain = _chain([("genesis", "a", 1)] * 5)
+    ledger = Ledger(undo_depth=2)
+    balances = _apply(ledger, chain)
+    before = dict(balances)
+    assert not ledger.rollback(balances, 5, 2)
+    assert balances == before
+
+
+def test_balances_at_is_an_overlay():
+    chain = _chain([("genesis", "a", 10), ("a", "b", 4)])
+    ledger = Ledger()
+    balances = _apply(ledger, chain)
+    view = ledger.balances_at(balances, 2, 2)
+    assert view["a"] == 10 and view["b"] == 0
+    assert balances == {"genesis": 90, "a": 6, "b": 4}
+    assert ledger.balances_at(balances, 2, 0) is None
+
+
+def test_recompute_matches_replay():
+    chain = _chain([("genesis", "a", 3), ("a", "b", 1), ("genesis", "c", 5), ("c", "a", 2)] * 3)
+    ledger = Ledger(snapshot_interval=4)
+    balances = _apply(ledger, chain)
+    assert ledger.recompute(chain, GENESIS) == balances == ledger.replay(chain, GENESIS)
+
+
+def test_recompute_drops_snapshots_from_replaced_branch():
+    chain = _chain([("genesis", "a", 1)] * 8)
+    ledger = Ledger(snapshot_interval=2, max_snapshots=10)
+    _apply(ledger, chain)
+    fork = _chain([("genesis", "a", 1)] * 4 + [("genesis", "b", 2)] * 4)
+    assert ledger.recompute(fork, GENESIS, fork_index=5) == ledger.replay(fork, GENESIS)
+    assert ledger.to_dict()["snapshots"][6] == ledger.replay(fork[:7], GENESIS)
+
+
+def test_restore_round_trip():
+    chain = _chain([("genesis", "a", 1)] * 6)
+    ledger = Ledger(snapshot_interval=3)
+    balances = _apply(ledger, chain)
+    restored = Ledger(snapshot_interval=3)
+    restored.restore({
+        "undo": {str(height): deltas for height, deltas in ledger.to_dict()["undo"].items()},
+        "snapshots": {str(height): dict(values) for height, values in ledger.to_dict()["snapshots"].items()}
+    })
+    assert restored.rollback(dict(balances), 6, 4)
+    assert restored.recompute(chain, GENESIS) == balances
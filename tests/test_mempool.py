@@ -0,0 +1,128 @@
+import pytest
+from blockchain.mempool import Mempool
+
+
+def _tx(transaction_id, amount=1, sender="alice", recipient="bob"):
+    return {"sender": sender, "recipient": recipient, "amount": amount, "signature": f"sig-{transaction_id}",
+            "transaction_id": transaction_id}
+
+
+def test_add_rejects_duplicates():
+    mempool = Mempool()
+    assert mempool.add(_tx("a"))
+    assert not mempool.add(_tx("a"))
+    assert len(mempool) == 1
+
+
+def test_add_rejects_a_pending_signature_under_a_new_id():
+    mempool = Mempool()
+    assert mempool.add(_tx("a"))
+    assert not mempool.add({**_tx("b"), "signature": "sig-a"})
+    mempool.pop("a")
+    assert mempool.add({**_tx("b"), "signature": "sig-a"})
+
+
+def test_remove_confirmed_drops_pending_copies_of_mined_signatures():
+    mempool = Mempool()
+    mempool.add(_tx("a"))
+    mempool.add(_tx("b"))
+    mempool.remove_confirmed([{**_tx("mined"), "signature": "sig-a"}, _tx("b")])
+    assert len(mempool) == 0
+
+
+@pytest.mark.parametrize("field, value", [("transaction_id", ["a"]), ("transaction_id", 7), ("signature", None)])
+def test_add_rejects_non_string_identifiers(field, value):
+    mempool = Mempool()
+    with pytest.raises(ValueError):
+        mempool.add({**_tx("a"), field: value})
+    assert len(mempool) == 0
+
+
+@pytest.mark.parametrize("amount", ["5", None, True, 0, -1, [1]])
+def test_add_rejects_invalid_amounts(amount):
+    mempool = Mempool()
+    with pytest.raises(ValueError):
+        mempool.add(_tx("a", amount=amount), balance=10)
+    assert len(mempool) == 0
+    assert mempool.pending_spend("alice") == 0
+
+
+def test_pending_spend_limits_overspend():
+    mempool = Mempool()
+    assert mempool.add(_tx("a", amount=6), balance=10)
+    with pytest.raises(ValueError, match="Insufficient funds"):
+        mempool.add(_tx("b", amount=5), balance=10)
+    assert mempool.add(_tx("c", amount=4), balance=10)
+    assert mempool.pending_spend("alice") == 10
+    mempool.pop("a")
+    assert mempool.pending_spend("alice") == 4
+
+
+def test_full_pool_evicts_lowest_amount():
+    mempool = Mempool(max_transactions=3)
+    for transaction_id, amount in (("a", 5), ("b", 1), ("c", 3)):
+        mempool.add(_tx(transaction_id, amount))
+    assert mempool.add(_tx("d", 2))
+    assert list(mempool) == ["a", "c", "d"]
+    with pytest.raises(ValueError, match="Mempool full"):
+        mempool.add(_tx("e", 1))
+    assert list(mempool) == ["a", "c", "d"]
+
+
+def test_equal_amounts_keep_arrival_order():
+    mempool = Mempool(max_transactions=2)
+    mempool.add(_tx("a", 2))
+    mempool.add(_tx("b", 2))
+    with pytest.raises(ValueError):
+        mempool.add(_tx("c", 2))
+    assert list(mempool) == ["a", "b"]
+    assert mempool.add(_tx("d", 3))
+    assert list(mempool) == ["a", "d"]
+
+
+def test_equal_priority_does_not_evict():
+    mempool = Mempool(max_transactions=1)
+    mempool.add(_tx("a", 2))
+    priority = mempool._entries["a"][2]
+    assert not mempool._make_room(1, priority)
+    assert list(mempool) == ["a"]
+
+
+def test_oversized_transaction_evicts_nothing():
+    single = Mempool()
+    single.add(_tx("a"))
+    mempool = Mempool(max_bytes=3 * single.total_bytes)
+    mempool.add(_tx("a", 1))
+    mempool.add(_tx("b", 1))
+    with pytest.raises(ValueError, match="Mempool full"):
+        mempool.add(_tx("c", 100, recipient="x" * mempool.max_bytes))
+    assert list(mempool) == ["a", "b"]
+
+
+def test_byte_cap_counts_json_size():
+    single = Mempool()
+    single.add(_tx("a"))
+    mempool = Mempool(max_bytes=2 * single.total_bytes)
+    mempool.add(_tx("a", 1))
+    mempool.add(_tx("b", 2))
+    assert mempool.add(_tx("c", 3))
+    assert list(mempool) == ["b", "c"]
+    assert mempool.total_bytes <= mempool.max_bytes
+
+
+def test_expired_transactions_are_dropped():
+    mempool = Mempool(max_age=60)
+    mempool.add(_tx("a"), now=1000)
+    mempool.add(_tx("b"), now=1030)
+    assert mempool.evict_expired(now=1070) == 1
+    assert list(mempool) == ["b"]
+    mempool.add(_tx("c"), now=1100)
+    assert list(mempool) == ["c"]
+
+
+def test_select_orders_by_amount_then_arrival():
+    mempool = Mempool()
+    for transaction_id, amount in (("a", 1), ("b", 3), ("c", 3), ("d", 2)):
+        mempool.add(_tx(transaction_id, amount))
+    assert [tx["transaction_id"] for tx in mempool.select()] == ["b", "c", "d", "a"]
+    assert [tx["transaction_id"] for tx in mempool.select(max_transactions=2)] == ["b", "c"]
@@ -0,0 +1,45 @@
+import pytest
+from blockchain.merkle_tree import MerkleTree
+
+
+def _transactions(count):
+    return [{"sender": "alice", "recipient": "bob", "amount": i + 1, "transaction_id": f"tx{i}"} for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5, 7, 8, 13])
+def test_every_proof_verifies(count):
+    transactions = _transactions(count)
+    tree = MerkleTree(transactions)
+    for position, transaction in enumerate(transactions):
+        assert MerkleTree.verify_proof(transaction, tree.proof(position), tree.root)
+
+
+def test_proof_fails_for_another_transaction():
+    transactions = _transactions(5)
+    tree = MerkleTree(transactions)
+    assert not MerkleTree.verify_proof(transactions[1], tree.proof(2), tree.root)
+    assert not MerkleTree.verify_proof(dict(transactions[2], amount=999), tree.proof(2), tree.root)
+
+
+def test_root_ignores_key_order_but_not_values():
+    transactions = _transactions(3)
+    reordered = [dict(reversed(list(tx.items()))) for tx in transactions]
+    assert MerkleTree(reordered).root == MerkleTree(transactions).root
+    assert MerkleTree(transactions[::-1]).root != MerkleTree(transactions).root
+
+
+def test_leaf_and_node_hashes_are_domain_separated():
+    # A two-leaf tree's root must not equal the leaf hash of anything built from the leaves.
+    transactions = _transactions(2)
+    tree = MerkleTree(transactions)
+    assert tree.root not in (level.hex() for level in tree.levels[0])
+    assert len(tree.proof(0)) == 1
+
+
+def test_empty_tree_and_out_of_range_position():
+    assert MerkleTree([]).root is None
+    tree = MerkleTree(_transactions(3))
+    with pytest.raises(IndexError):
+        tree.proof(3)
+    with pytest.raises(IndexError):
+        tree.proof(-1)
@@ -0,0 +1,46 @@
+from cryptolib.verifier import SignatureVerifier
+from database.memory_storage import MemoryStorage
+from monitoring import metrics
+
+
+def _lines(text):
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+
+def test_render_keeps_only_matching_series():
+    registry = metrics.Registry()
+    counter = registry.counter("requests_total", "Requests.", ["node", "path"])
+    unlabelled = registry.counter("events_total", "Events.")
+    counter.labels(node="a", path="/x").inc()
+    counter.labels(node="b", path="/x").inc(2)
+    unlabelled.inc(3)
+    assert _lines(registry.render(node="a")) == ['requests_total{node="a",path="/x"} 1', 'events_total 3']
+    assert len(_lines(registry.render())) == 3
+
+
+def test_render_filters_histogram_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("seconds", "Seconds.", ["node"], buckets=(1.0,))
+    histogram.labels(node="a").observe(0.5)
+    histogram.labels(node="b").observe(2.0)
+    assert _lines(registry.render(node="b")) == [
+        'seconds_bucket{node="b",le="1.0"} 0', 'seconds_bucket{node="b",le="+Inf"} 1',
+        'seconds_sum{node="b"} 2.0', 'seconds_count{node="b"} 1'
+    ]
+
+
+def test_nodes_sharing_a_verifier_count_their_own_verifications(make_blockchain, signed_transfer, recipient):
+    shared = SignatureVerifier(workers=1)
+    first = make_blockchain(MemoryStorage("metrics_first"), verifier=shared)
+    second = make_blockchain(MemoryStorage("metrics_second"), verifier=shared)
+    assert first.verifier._get_executor() is second.verifier._get_executor() is shared._get_executor()
+    first.add_transactions([signed_transfer(recipient) for _ in range(3)])
+    transfer = signed_transfer(recipient)
+    second.verifier.verify(transfer["sender"], f"{transfer['sender']}{recipient}1", transfer["signature"])
+
+    first_lines = _lines(metrics.REGISTRY.render(node="metrics_first"))
+    assert 'blockchain_signature_verifications_total{node="metrics_first"} 3' in first_lines
+    assert not any("metrics_second" in line for line in first_lines)
+    assert 'blockchain_signature_verifications_total{node="metrics_second"} 1' in \
+        _lines(metrics.REGISTRY.render(node="metrics_second"))
+    shared.shutdown()
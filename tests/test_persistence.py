@@ -0,0 +1,53 @@
+import pytest
+from database.memory_storage import MemoryStorage
+
+
+@pytest.fixture
+def grow(signed_transfer, recipient):
+    def grow(blockchain, blocks, pending=0):
+        for _ in range(blocks):
+            blockchain.add_transaction(signed_transfer(recipient))
+            assert blockchain.mine() is not None
+        for _ in range(pending):
+            blockchain.add_transaction(signed_transfer(recipient))
+    return grow
+
+
+def _assert_same_state(loaded, original):
+    assert [block.hash for block in loaded.chain] == [block.hash for block in original.chain]
+    assert loaded.wallets == original.wallets
+    assert list(loaded.mempool.values()) == list(original.mempool.values())
+    assert loaded.tx_index.to_dict() == original.tx_index.to_dict()
+    assert loaded._delta_seq == original._delta_seq
+
+
+def test_deltas_after_the_checkpoint_are_replayed(make_blockchain, grow):
+    storage = MemoryStorage()
+    blockchain = make_blockchain(storage)
+    grow(blockchain, 2, pending=1)
+    blockchain.update_wallets({"faucet": 5})
+    assert storage.load_checkpoint()["height"] == 0
+    assert len(storage.deltas) == 6
+
+    loaded = make_blockchain(storage)
+    assert loaded.startup_stats["mode"] == "checkpoint"
+    _assert_same_state(loaded, blockchain)
+    assert loaded.wallets["faucet"] == 5
+
+    # The reopened node keeps appending after the replayed deltas.
+    grow(loaded, 1)
+    _assert_same_state(make_blockchain(storage), loaded)
+
+
+def test_checkpoint_folds_and_prunes_deltas(make_blockchain, grow):
+    storage = MemoryStorage()
+    blockchain = make_blockchain(storage, checkpoint_interval=3)
+    grow(blockchain, 3, pending=1)
+    checkpoint = storage.load_checkpoint()
+    assert (checkpoint["height"], checkpoint["delta_seq"]) == (3, 6)
+    assert sorted(storage.deltas) == [6]
+    assert sorted(storage.blocks) == list(range(4))
+
+    loaded = make_blockchain(storage, checkpoint_interval=3)
+    _assert_same_state(loaded, blockchain)
+    assert len(loaded.mempool) == 1
@@ -0,0 +1,23 @@
+import pytest
+from flask import Flask
+from routes import setup_routes
+
+
+@pytest.fixture
+def client(make_blockchain):
+    app = Flask(__name__)
+    setup_routes(app, make_blockchain(), 5000)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("query", ["limit=-5", "limit=0", "since=-1", "limit=abc"])
+def test_wallet_transactions_reject_invalid_pages(client, query):
+    response = client.get(f"/transactions/someone?{query}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid pagination parameters"}
+
+
+def test_wallet_transactions_page(client):
+    response = client.get("/transactions/someone?limit=1")
+    assert response.status_code == 200
+    assert response.get_json() == {"transactions": [], "next_cursor": None}
@@ -0,0 +1,100 @@
+import pytest
+from blockchain.block import Block
+from blockchain.serialization import (decode_block, decode_blocks, decode_transaction, encode_block,
+                                      encode_blocks, encode_transaction, iter_decode_blocks, iter_encode_blocks)
+from cryptolib.crypto import Crypto
+
+
+@pytest.fixture(scope="module")
+def signed_transaction():
+    private_key, sender = Crypto.generate_keypair()
+    recipient = Crypto.generate_keypair()[1]
+    return {
+        "sender": sender,
+        "recipient": recipient,
+        "amount": 5,
+        "signature": Crypto.sign_transaction(private_key, f"{sender}{recipient}5"),
+        "timestamp": 1700000000.25,
+        "transaction_id": "0f6e8a53-3b0c-4c1e-9d8e-7d7bb5f0a1c2"
+    }
+
+
+def _block(transactions, index=1):
+    block = Block(index, transactions, "0" * 64, timestamp=1700000000.5)
+    block.mine(difficulty=1)
+    return block
+
+
+def test_signed_transaction_round_trip_uses_raw_fields(signed_transaction):
+    encoded = encode_transaction(signed_transaction)
+    assert decode_transaction(encoded) == signed_transaction
+    # mask, two 33-byte keys, int amount, 64-byte signature + uuid, float timestamp, uuid id, extras count
+    assert len(encoded) == 1 + 2 * (1 + 33) + 9 + (1 + 64 + 16) + 9 + (1 + 16) + 2
+
+
+@pytest.mark.parametrize("changes", [
+    {"sender": "GENESIS_WALLET", "recipient": "not base64!"},
+    {"signature": "genesis"},
+    {"signature": "c2lnbmF0dXJl(not-a-uuid)"},
+    {"transaction_id": "0F6E8A53-3B0C-4C1E-9D8E-7D7BB5F0A1C2"},
+    {"transaction_id": "bench-17"},
+    {"amount": 2.5},
+    {"amount": 2 ** 70},
+    {"amount": True},
+    {"timestamp": None},
+    {"memo": {"nested": [1, "two", None]}, "fee": 0},
+])
+def test_fallbacks_round_trip_exactly(signed_transaction, changes):
+    transaction = dict(signed_transaction, **changes)
+    decoded = decode_transaction(encode_transaction(transaction))
+    assert decoded == transaction
+    assert [type(decoded[key]) for key in transaction] == [type(value) for value in transaction.values()]
+
+
+def test_missing_fields_stay_missing(signed_transaction):
+    transaction = {key: signed_transaction[key] for key in ("sender", "recipient", "amount")}
+    assert decode_transaction(encode_transaction(transaction)) == transaction
+
+
+def test_block_round_trip_keeps_hash(signed_transaction):
+    block = _block([signed_transaction, dict(signed_transaction, transaction_id="custom-id", amount=1.5)])
+    decoded = Block.from_bytes(block.to_bytes())
+    assert decoded.to_dict() == block.to_dict()
+    assert decoded.hash == block.hash
+
+
+def test_genesis_block_round_trip():
+    genesis = Block(0, [{"sender": "ICO", "recipient": "genesis", "amount": 1000000, "signature": "genesis",
+                         "timestamp": 1638316800.0}], "0", timestamp=1638316800.0)
+    assert decode_block(encode_block(genesis)) == genesis.to_dict()
+
+
+def test_header_only_encoding(signed_transaction):
+    block = _block([signed_transaction])
+    decoded = decode_block(encode_block(block, include_transactions=False))
+    assert decoded["transactions"] == []
+    assert Block.from_header(decoded).hash == block.hash
+
+
+def test_streamed_blocks_decode_from_any_chunking(signed_transaction):
+    blocks = [_block([dict(signed_transaction, amount=index)], index) for index in range(1, 6)]
+    payload = b"".join(iter_encode_blocks(blocks))
+    assert payload == encode_blocks(blocks)
+    expected = [block.to_dict() for block in blocks]
+    assert decode_blocks(payload) == expected
+    for size in (1, 7, 100, len(payload)):
+        chunks = [payload[i:i + size] for i in range(0, len(payload), size)]
+        assert list(iter_decode_blocks(chunks)) == expected
+
+
+def test_truncated_stream_raises(signed_transaction):
+    payload = encode_blocks([_block([signed_transaction], index) for index in (1, 2)])
+    with pytest.raises(ValueError):
+        list(iter_decode_blocks([payload[:-10]]))
+
+
+def test_unknown_version_is_rejected(signed_transaction):
+    encoded = bytearray(encode_block(_block([signed_transaction])))
+    encoded[0] = 99
+    with pytest.raises(ValueError):
+        decode_block(bytes(encoded))
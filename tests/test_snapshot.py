@@ -0,0 +1,82 @@
+import json
+import pytest
+from cryptolib.crypto import Crypto
+from database.memory_storage import MemoryStorage
+
+
+@pytest.fixture
+def open_node(make_blockchain):
+    def open_node(storage, snapshot_path, **options):
+        return make_blockchain(storage, checkpoint_interval=5, snapshot_path=snapshot_path, **options)
+    return open_node
+
+
+@pytest.fixture
+def grow(signed_transfer):
+    def grow(blockchain, blocks):
+        recipient = Crypto.generate_keypair()[1]
+        for _ in range(blocks):
+            blockchain.add_transaction(signed_transfer(recipient))
+            assert blockchain.mine() is not None
+    return grow
+
+
+def _assert_same_state(loaded, original):
+    assert [block.to_dict() for block in loaded.chain] == [block.to_dict() for block in original.chain]
+    assert loaded.wallets == original.wallets
+    assert loaded.tx_index.to_dict() == original.tx_index.to_dict()
+    assert loaded.address_index.to_dict()["postings"] == original.address_index.to_dict()["postings"]
+    assert dict(loaded.ledger.to_dict()["undo"]) == dict(original.ledger.to_dict()["undo"])
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "node.snapshot.json")
+
+
+def test_snapshot_is_written_every_interval(open_node, grow, snapshot_path):
+    blockchain = open_node(MemoryStorage(), snapshot_path, snapshot_interval=10)
+    heights = []
+    for _ in range(6):
+        grow(blockchain, 5)
+        blockchain.wait_for_snapshot()
+        with open(snapshot_path) as f:
+            heights.append((blockchain._stored_height, json.load(f)["height"]))
+    snapshot_heights = [height for _, height in heights]
+    assert snapshot_heights[0] == 0
+    assert snapshot_heights == sorted(snapshot_heights)
+    assert len(set(snapshot_heights)) < len(snapshot_heights)
+    assert all(stored - height < 10 for stored, height in heights)
+
+
+def test_startup_from_a_snapshot_older_than_the_checkpoint(open_node, grow, snapshot_path):
+    storage = MemoryStorage()
+    original = open_node(storage, snapshot_path, snapshot_interval=10)
+    grow(original, 27)
+    original.wait_for_snapshot()
+    with open(snapshot_path) as f:
+        snapshot_height = json.load(f)["height"]
+    assert 0 < snapshot_height < storage.load_checkpoint()["height"] < len(original.chain) - 1
+
+    loaded = open_node(storage, snapshot_path, snapshot_interval=10, recent_blocks=3)
+    assert loaded.startup_stats["mode"] == "snapshot"
+    assert loaded.wait_for_history(10)
+    _assert_same_state(loaded, original)
+    assert loaded.ledger.rollback(dict(loaded.wallets), len(loaded.chain) - 1, snapshot_height - 1)
+
+
+def test_snapshot_from_a_replaced_branch_is_not_used(open_node, grow, snapshot_path):
+    storage = MemoryStorage()
+    original = open_node(storage, snapshot_path, snapshot_interval=10)
+    grow(original, 12)
+    original.wait_for_snapshot()
+    fork = open_node(MemoryStorage(), None)
+    fork.chain[0] = original.chain[0]
+    fork.replace_chain(original.chain[:3])
+    grow(fork, 15)
+    assert original.replace_chain(fork.chain)
+    original.wait_for_snapshot()
+
+    loaded = open_node(storage, snapshot_path, snapshot_interval=10)
+    assert loaded.wait_for_history(10)
+    _assert_same_state(loaded, original)
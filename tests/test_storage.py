@@ -0,0 +1,20 @@
+import pytest
+from database.storage import Storage, create_storage
+
+
+def test_incomplete_backend_fails_at_construction():
+    class Partial(Storage):
+        def save_block(self, block, overwrite=False):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_embedded_backends_implement_storage(backend, tmp_path):
+    storage = create_storage("test", backend, **({"path": str(tmp_path / "test.sqlite3")} if backend == "sqlite" else {}))
+    assert isinstance(storage, Storage)
+    storage.save_tip({"index": 0, "hash": "00"})
+    assert storage.load_tip()["index"] == 0
+    storage.close()